@@ -1,10 +1,15 @@
+import os
+import sys
+import threading
 from flask import Flask, request, jsonify
 import pandas as pd
 import numpy as np
-# Import necessary libraries
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
-from surprise import Dataset, Reader, SVD
+
+# Shared recommender helpers live next to the other python services
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server'))
+from fusion import Fusion
+from instrumentation import span, timed, register_endpoints
+from model_artifacts import SnapshotWriter, load_current_snapshot, snapshot_matches_catalog, add_catalog, save_kmeans, load_kmeans, save_tfidf, load_tfidf_matrix, load_tfidf_vectorizer, save_svd, load_svd
 
 # 1. Load Data
 
@@ -16,13 +21,13 @@ user_data = pd.DataFrame({
     'location': ['CityA', 'CityB', 'CityA', 'CityC', 'CityB']
 })
 
-# Encode categorical variables
-user_data_encoded = pd.get_dummies(user_data, columns=['gender', 'location'])
-
-# Segment users
-demographic_features = user_data_encoded.drop('user_id', axis=1)
-kmeans = KMeans(n_clusters=2, random_state=42)
-user_data['segment'] = kmeans.fit_predict(demographic_features)
+# Product Data
+product_data = pd.DataFrame({
+    'product_id': [101, 102, 103, 104, 105],
+    'category': ['Electronics', 'Clothing', 'Home', 'Electronics', 'Clothing'],
+    'brand': ['BrandX', 'BrandY', 'BrandZ', 'BrandY', 'BrandX'],
+    'price_range': ['High', 'Medium', 'Low', 'Medium', 'Low']
+})
 
 # Interaction Data
 interaction_data = pd.DataFrame({
@@ -32,36 +37,122 @@ interaction_data = pd.DataFrame({
     'rating': [5, 4, 5, 3, 4, 2, 5, 4, 3, 4]
 })
 
-# Merge user segments with interaction data
-interaction_data = interaction_data.merge(user_data[['user_id', 'segment']], on='user_id')
-
-# Product Data
-product_data = pd.DataFrame({
-    'product_id': [101, 102, 103, 104, 105],
-    'category': ['Electronics', 'Clothing', 'Home', 'Electronics', 'Clothing'],
-    'brand': ['BrandX', 'BrandY', 'BrandZ', 'BrandY', 'BrandX'],
-    'price_range': ['High', 'Medium', 'Low', 'Medium', 'Low']
-})
-
 # Create combined features
 product_data['combined_features'] = product_data['category'] + ' ' + product_data['brand'] + ' ' + product_data['price_range']
 
 # 2. Prepare Models
 
-# TF-IDF Matrix
-tfidf = TfidfVectorizer()
-tfidf_matrix = tfidf.fit_transform(product_data['combined_features'])
+# Models (and sklearn / surprise) are loaded on first use: every function
+# that needs them calls warm_up() first, which loads them once (a flag check
+# after that); the server calls it at start-up, and RECOMMENDER_LAZY=0 does
+# it at import. Importing app stays cheap.
+ARTIFACTS_NAME = 'app'
+MODEL_NAMES = ['snapshot', 'catalog_snapshot', 'kmeans', 'demographic_columns', 'tfidf', 'tfidf_matrix', 'interaction_matrix',
+               'content_index', 'trainset', 'algo', 'svd_scorer', 'top_products_per_segment']
+models_lock = threading.Lock()
+models_loaded = False
+
+def load_models():
+    global snapshot, catalog_snapshot, kmeans, demographic_columns, interaction_data, tfidf, tfidf_matrix, interaction_matrix
+    global content_index, trainset, algo, svd_scorer, top_products_per_segment
+    from surprise import Dataset, Reader
+    from user_profiles import InteractionMatrix
+    from candidate_index import build_candidate_index
+    from svd_scoring import SVDScorer
+
+    # Prebuilt models (see server/build_artifacts.py); fall back to fitting when there is no usable snapshot.
+    # Segments, SVD and segment popularity don't depend on the catalog; the TF-IDF rows only come from
+    # catalog_snapshot, the snapshot if it was built for this catalog
+    snapshot = load_current_snapshot(ARTIFACTS_NAME)
+    catalog_snapshot = snapshot if snapshot_matches_catalog(snapshot, product_data['product_id'], product_data['combined_features']) else None
+
+    # Encode categorical variables
+    user_data_encoded = pd.get_dummies(user_data, columns=['gender', 'location'])
+
+    # Segment users
+    demographic_features = user_data_encoded.drop('user_id', axis=1)
+    if snapshot is not None:
+        kmeans, demographic_columns = load_kmeans(snapshot)
+        demographic_features = demographic_features.reindex(columns=demographic_columns, fill_value=0)
+    else:
+        # sklearn (and surprise's SVD below) are only imported when there is something to fit
+        from sklearn.cluster import KMeans
+
+        kmeans = KMeans(n_clusters=2, random_state=42)
+        kmeans.fit(demographic_features)
+        demographic_columns = list(demographic_features.columns)
+    user_data['segment'] = kmeans.predict(demographic_features)
+
+    # Merge user segments with interaction data
+    interaction_data = interaction_data.merge(user_data[['user_id', 'segment']], on='user_id')
+
+    # TF-IDF Matrix
+    if catalog_snapshot is not None:
+        # The fitted vectorizer is only needed by save_artifacts
+        tfidf, tfidf_matrix = None, load_tfidf_matrix(catalog_snapshot)
+    else:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        tfidf = TfidfVectorizer()
+        tfidf_matrix = tfidf.fit_transform(product_data['combined_features'])
 
-# Collaborative Filtering Model
-reader = Reader(rating_scale=(1, 5))
-data = Dataset.load_from_df(interaction_data[['user_id', 'product_id', 'rating']], reader)
-trainset = data.build_full_trainset()
-algo = SVD()
-algo.fit(trainset)
+    # Sparse user x product interaction matrix, so per-user lookups don't scan interaction_data
+    interaction_matrix = InteractionMatrix(interaction_data, product_data['product_id'])
 
-# Popular Products per Segment
-popular_products = interaction_data.groupby(['segment', 'product_id']).size().reset_index(name='counts')
-top_products_per_segment = popular_products.sort_values(['segment', 'counts'], ascending=False).groupby('segment').head(2)
+    # Candidate retrieval over the TF-IDF vectors (exact for small catalogs, IVF otherwise)
+    content_index = build_candidate_index(tfidf_matrix)
+
+    # Collaborative Filtering Model
+    reader = Reader(rating_scale=(1, 5))
+    data = Dataset.load_from_df(interaction_data[['user_id', 'product_id', 'rating']], reader)
+    trainset = data.build_full_trainset()
+    algo = load_svd(snapshot, trainset) if snapshot is not None else None
+    if algo is None:
+        from surprise import SVD
+
+        algo = SVD()
+        algo.fit(trainset)
+
+    # Vectorized SVD scoring over the whole catalog (same estimates as algo.predict)
+    svd_scorer = SVDScorer(algo, product_data['product_id'])
+
+    # Popular Products per Segment
+    if snapshot is not None:
+        top_products_per_segment = snapshot.frame('top_products_per_segment')
+    else:
+        popular_products = interaction_data.groupby(['segment', 'product_id']).size().reset_index(name='counts')
+        top_products_per_segment = popular_products.sort_values(['segment', 'counts'], ascending=False).groupby('segment').head(2)
+
+def warm_up():
+    """Load or fit the models if that hasn't happened yet."""
+    global models_loaded
+    if models_loaded:
+        return
+    with models_lock:
+        if not models_loaded:
+            load_models()
+            models_loaded = True
+
+def __getattr__(name):
+    # app.kmeans etc. from other modules (PEP 562)
+    if name in MODEL_NAMES:
+        warm_up()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def save_artifacts():
+    """Write the fitted models as a new snapshot and make it CURRENT. Returns the snapshot path."""
+    warm_up()
+    writer = SnapshotWriter(ARTIFACTS_NAME)
+    add_catalog(writer, product_data['product_id'], product_data['combined_features'])
+    save_kmeans(writer, kmeans, demographic_columns)
+    save_tfidf(writer, tfidf if tfidf is not None else load_tfidf_vectorizer(catalog_snapshot), tfidf_matrix)
+    save_svd(writer, algo)
+    writer.add_frame('top_products_per_segment', top_products_per_segment)
+    return writer.publish()
+
+# Hybrid score fusion weights per source
+fusion = Fusion({'demographic': 1, 'content': 2, 'collaborative': 3})
 
 # 3. Define Functions
 
@@ -70,62 +161,62 @@ def recommend_demographic(user_segment, top_products_per_segment, num_recommenda
     return recommendations.tolist()
 
 def build_user_profile(user_id):
-    user_interactions = interaction_data[interaction_data['user_id'] == user_id]
-    interacted_product_ids = user_interactions['product_id'].unique()
-    product_indices = product_data[product_data['product_id'].isin(interacted_product_ids)].index
-    user_tfidf_matrix = tfidf_matrix[product_indices]
-    user_profile = user_tfidf_matrix.mean(axis=0)
-    return user_profile
+    warm_up()
+    return interaction_matrix.profile(user_id, tfidf_matrix)
 
 def recommend_content_based(user_id, num_recommendations=2):
+    warm_up()
     user_profile = build_user_profile(user_id)
-    from sklearn.metrics.pairwise import cosine_similarity
-    similarities = cosine_similarity(user_profile, tfidf_matrix).flatten()
-    similar_indices = similarities.argsort()[::-1]
-    recommended_product_ids = product_data.iloc[similar_indices]['product_id']
-    interacted_product_ids = interaction_data[interaction_data['user_id'] == user_id]['product_id'].unique()
-    recommendations = recommended_product_ids[~recommended_product_ids.isin(interacted_product_ids)].head(num_recommendations)
-    return recommendations.tolist()
+    interacted = interaction_matrix.interacted_mask(user_id)
+    recommendations, _ = content_index.search(user_profile, num_recommendations, allowed=~interacted)
+    return product_data['product_id'].to_numpy()[recommendations].tolist()
 
 def recommend_collaborative(user_id, num_recommendations=2):
-    product_ids = product_data['product_id'].tolist()
-    interacted_products = interaction_data[interaction_data['user_id'] == user_id]['product_id'].unique()
-    products_to_predict = [pid for pid in product_ids if pid not in interacted_products]
-    predictions = [algo.predict(user_id, pid) for pid in products_to_predict]
-    predictions.sort(key=lambda x: x.est, reverse=True)
-    top_predictions = predictions[:num_recommendations]
-    recommendations = [pred.iid for pred in top_predictions]
-    return recommendations
+    warm_up()
+    interacted = interaction_matrix.interacted_mask(user_id)
+    return svd_scorer.recommend(user_id, num_recommendations, exclude=interacted)
 
+@timed('hybrid_recommendation')
 def hybrid_recommendation(user_id, user_segment, num_recommendations=3):
-    demographic_recs = recommend_demographic(user_segment, top_products_per_segment, num_recommendations*2)
-    content_recs = recommend_content_based(user_id, num_recommendations*2)
-    collaborative_recs = recommend_collaborative(user_id, num_recommendations*2)
-    recs = pd.DataFrame({'product_id': demographic_recs + content_recs + collaborative_recs})
-    recs['score'] = 0
-    recs.loc[recs['product_id'].isin(demographic_recs), 'score'] += 1
-    recs.loc[recs['product_id'].isin(content_recs), 'score'] += 2
-    recs.loc[recs['product_id'].isin(collaborative_recs), 'score'] += 3
-    interacted_products = interaction_data[interaction_data['user_id'] == user_id]['product_id'].unique()
-    recs = recs[~recs['product_id'].isin(interacted_products)]
-    top_recs = recs.sort_values('score', ascending=False)['product_id'].drop_duplicates().head(num_recommendations)
-    return top_recs.tolist()
+    warm_up()
+    with span('hybrid_recommendation.demographic'):
+        demographic_recs = recommend_demographic(user_segment, top_products_per_segment, num_recommendations*2)
+    with span('hybrid_recommendation.content'):
+        content_recs = recommend_content_based(user_id, num_recommendations*2)
+    with span('hybrid_recommendation.collaborative'):
+        collaborative_recs = recommend_collaborative(user_id, num_recommendations*2)
+    with span('hybrid_recommendation.fusion'):
+        ranked_lists = {
+            'demographic': interaction_matrix.product_positions(demographic_recs),
+            'content': interaction_matrix.product_positions(content_recs),
+            'collaborative': interaction_matrix.product_positions(collaborative_recs),
+        }
+        top_recs = fusion.fuse(ranked_lists, num_recommendations, exclude=interaction_matrix.interacted_mask(user_id))
+    return product_data['product_id'].to_numpy()[top_recs].tolist()
 
 # 4. Initialize Flask App
 
 app = Flask(__name__)
+register_endpoints(app)
 
 @app.route('/recommend', methods=['GET', 'POST'])
 def recommend():
+    warm_up()
     if request.method == 'POST':
         user_id = request.json['user_id']
     else:
         user_id = request.args.get('user_id', default=1, type=int)
     # Fetch user segment
-    user_segment = user_data[user_data['user_id'] == user_id]['segment'].values[0]
+    with span('recommend.segment'):
+        user_segment = user_data[user_data['user_id'] == user_id]['segment'].values[0]
     # Generate recommendations
     recommendations = hybrid_recommendation(user_id, user_segment)
-    return jsonify({'recommendations': recommendations})
+    with span('recommend.render'):
+        return jsonify({'recommendations': recommendations})
+
+if os.environ.get('RECOMMENDER_LAZY', '1') == '0':
+    warm_up()
 
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True)
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import functools
+import http.server
+import numpy as np
+from selenium.webdriver.common.by import By
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extractor import setup_driver, extract_product_info, extract_all_products, PRODUCT_SELECTOR
+
+# Extraction latency on the saved search page in fixtures/: one WebDriver
+# round trip per field (extract_product_info) against a single execute_script
+# call for all cards (extract_all_products). Both paths must return the same
+# records. Needs Chrome + chromedriver.
+#
+#   python benchmarks/bench_extraction.py --repeat 10
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures')
+
+def serve_fixtures(port):
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=FIXTURES_DIR)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def per_element(driver, query, num_products):
+    products = driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR)[:num_products]
+    return [extract_product_info(product, query) for product in products]
+
+def time_calls(function, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return result, np.array(timings) * 1e3
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark product card extraction.')
+    parser.add_argument('--num-products', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = serve_fixtures(args.port)
+    driver = setup_driver()
+    try:
+        driver.get(f"http://127.0.0.1:{args.port}/meesho_search.html")
+        query = 'jewellery'
+
+        per_element_records, per_element_timings = time_calls(per_element, args.repeat, driver, query, args.num_products)
+        bulk_records, bulk_timings = time_calls(extract_all_products, args.repeat, driver, query, args.num_products)
+    finally:
+        driver.quit()
+        server.shutdown()
+
+    if per_element_records != bulk_records:
+        mismatches = sum(a != b for a, b in zip(per_element_records, bulk_records))
+        sys.exit(f"Extraction results differ: {mismatches} mismatched records, "
+                 f"{len(per_element_records)} vs {len(bulk_records)} extracted")
+
+    print(f"products={len(bulk_records)} repeat={args.repeat}")
+    for name, timings in (('per-element', per_element_timings), ('bulk', bulk_timings)):
+        print(f"{name:>12}: p50 {np.percentile(timings, 50):9.1f} ms   p99 {np.percentile(timings, 99):9.1f} ms")
+    print(f"speedup (p50): {np.percentile(per_element_timings, 50) / np.percentile(bulk_timings, 50):.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,24 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 from selenium.webdriver.common.action_chains import ActionChains
 import time
+import os
 import csv
 import re
+import json
+import hashlib
+import queue
+import argparse
+import threading
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Search page URL template; point it at a local server to scrape saved fixtures offline
+SEARCH_URL = "https://www.meesho.com/search?q={query}"
+PRODUCT_SELECTOR = "[class*='ProductList__GridCol']"
+CSV_FIELDS = ["Query", "Title", "Price", "Rating", "Reviews", "Image URL", "Product URL"]
 
 def setup_driver():
     options = webdriver.ChromeOptions()
@@ -18,28 +30,115 @@ def setup_driver():
     options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
     return webdriver.Chrome(options=options)
 
-def scroll_to_load_products(driver, target_count, max_scrolls=50):
-    products_loaded = 0
+class DriverPool:
+    """A bounded pool of reusable headless Chrome drivers, created on first use."""
+    def __init__(self, size):
+        self.size = size
+        self.idle = queue.Queue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if self.idle.empty() and self.created < self.size:
+                    self.created += 1
+                    break
+            try:
+                return self.idle.get(timeout=1)
+            except queue.Empty:
+                continue  # Recheck: a discarded or failed driver may have freed a slot
+        try:
+            return setup_driver()
+        except Exception:
+            # Give the slot back, or a failed start would shrink the pool for good
+            with self.lock:
+                self.created -= 1
+            raise
+
+    def release(self, driver):
+        self.idle.put(driver)
+
+    def discard(self, driver):
+        # A driver that failed mid-scrape may be unusable; replace it lazily
+        try:
+            driver.quit()
+        finally:
+            with self.lock:
+                self.created -= 1
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get().quit()
+
+def scroll_to_load_products(driver, target_count, max_scrolls=50, wait_timeout=10):
+    products_loaded = len(driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR))
     scroll_count = 0
-    last_height = driver.execute_script("return document.body.scrollHeight")
 
     while products_loaded < target_count and scroll_count < max_scrolls:
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)  # Wait for new products to load
-        
-        new_height = driver.execute_script("return document.body.scrollHeight")
-        if new_height == last_height:
+
+        # Wait until more products are rendered instead of sleeping a fixed time
+        try:
+            WebDriverWait(driver, wait_timeout, poll_frequency=0.2).until(
+                lambda d: len(d.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR)) > products_loaded
+            )
+        except TimeoutException:
             print("Reached the end of the page or no new products loaded.")
             break
-        last_height = new_height
 
-        products = driver.find_elements(By.CSS_SELECTOR, "[class*='ProductList__GridCol']")
-        products_loaded = len(products)
+        products_loaded = len(driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR))
         print(f"Scroll {scroll_count + 1}: Products loaded: {products_loaded}")
         scroll_count += 1
 
     return products_loaded
 
+def clean_price(price):
+    return re.sub(r'[^\d.]', '', price)  # Remove non-numeric characters
+
+def clean_reviews(reviews):
+    return re.sub(r'[^\d]', '', reviews)  # Extract only the number
+
+# Reads every card's fields in the browser and returns them in one WebDriver
+# round trip. Same selectors as extract_product_info; null means "not found".
+EXTRACT_PRODUCTS_SCRIPT = """
+const cards = Array.from(document.querySelectorAll(arguments[0])).slice(0, arguments[1]);
+const text = (card, selector) => {
+    const element = card.querySelector(selector);
+    return element ? element.innerText.trim() : null;
+};
+const property = (card, selector, name) => {
+    const element = card.querySelector(selector);
+    if (!element) return null;
+    return element.getAttribute(name) === null ? '' : element[name];
+};
+return cards.map(card => [
+    text(card, "[class*='ProductTitle']"),
+    text(card, "[class*='PriceRow'] h5"),
+    text(card, "[class*='Rating'] span"),
+    text(card, "[class*='RatingCount']"),
+    property(card, "img", "src"),
+    property(card, "a", "href"),
+]);
+"""
+
+def extract_all_products(driver, query, num_products):
+    """Extract the first num_products cards with a single execute_script call."""
+    cards = driver.execute_script(EXTRACT_PRODUCTS_SCRIPT, PRODUCT_SELECTOR, num_products)
+
+    products_data = []
+    for title, price, rating, reviews, image_url, product_url in cards:
+        products_data.append({
+            "Query": query,
+            "Title": title if title is not None else "N/A",
+            "Price": clean_price(price) if price is not None else "N/A",
+            "Rating": rating if rating is not None else "N/A",
+            "Reviews": clean_reviews(reviews) if reviews is not None else "N/A",
+            "Image URL": image_url if image_url is not None else "N/A",
+            "Product URL": product_url if product_url is not None else "N/A"
+        })
+    return products_data
+
 def extract_product_info(product, query):
     try:
         title = product.find_element(By.CSS_SELECTOR, "[class*='ProductTitle']").text.strip()
@@ -47,8 +146,7 @@ def extract_product_info(product, query):
         title = "N/A"
 
     try:
-        price = product.find_element(By.CSS_SELECTOR, "[class*='PriceRow'] h5").text.strip()
-        price = re.sub(r'[^\d.]', '', price)  # Remove non-numeric characters
+        price = clean_price(product.find_element(By.CSS_SELECTOR, "[class*='PriceRow'] h5").text.strip())
     except NoSuchElementException:
         price = "N/A"
 
@@ -58,8 +156,7 @@ def extract_product_info(product, query):
         rating = "N/A"
 
     try:
-        reviews = product.find_element(By.CSS_SELECTOR, "[class*='RatingCount']").text.strip()
-        reviews = re.sub(r'[^\d]', '', reviews)  # Extract only the number
+        reviews = clean_reviews(product.find_element(By.CSS_SELECTOR, "[class*='RatingCount']").text.strip())
     except NoSuchElementException:
         reviews = "N/A"
 
@@ -83,14 +180,16 @@ def extract_product_info(product, query):
         "Product URL": product_url
     }
 
-def scrape_meesho_products(search_term, num_products=100, timeout=300):
-    driver = setup_driver()
+def scrape_meesho_products(search_term, num_products=100, timeout=300, driver=None, search_url=SEARCH_URL):
+    owns_driver = driver is None
+    if owns_driver:
+        driver = setup_driver()
     products_data = []
     start_time = time.time()
 
     try:
         encoded_search_term = urllib.parse.quote(search_term)
-        url = f"https://www.meesho.com/search?q={encoded_search_term}"
+        url = search_url.format(query=encoded_search_term)
         driver.get(url)
         print(f"Page loaded for '{search_term}'. Starting to scroll...")
 
@@ -102,54 +201,267 @@ def scrape_meesho_products(search_term, num_products=100, timeout=300):
 
         print(f"Found {products_loaded} products. Extracting data...")
 
-        products = driver.find_elements(By.CSS_SELECTOR, "[class*='ProductList__GridCol']")[:num_products]
+        if time.time() - start_time > timeout:
+            print("Timeout reached. Extracted 0 products.")
+            return products_data
+
+        try:
+            products_data = extract_all_products(driver, search_term, num_products)
+            print(f"Extracted {len(products_data)} products")
+        except WebDriverException as e:
+            # Fall back to one WebDriver call per field if the script can't run
+            print(f"Bulk extraction failed ({e.msg}), extracting product by product...")
+            products = driver.find_elements(By.CSS_SELECTOR, PRODUCT_SELECTOR)[:num_products]
 
-        for i, product in enumerate(products, 1):
-            if time.time() - start_time > timeout:
-                print(f"Timeout reached. Extracted {i-1} products.")
-                break
-            product_info = extract_product_info(product, search_term)
-            products_data.append(product_info)
-            print(f"Extracted product {i}/{len(products)}")
+            for i, product in enumerate(products, 1):
+                if time.time() - start_time > timeout:
+                    print(f"Timeout reached. Extracted {i-1} products.")
+                    break
+                product_info = extract_product_info(product, search_term)
+                products_data.append(product_info)
+                print(f"Extracted product {i}/{len(products)}")
 
+    except WebDriverException as e:
+        print(f"An error occurred: {str(e)}")
+        # A pooled driver may be dead now; scrape_with_pool discards it instead of reusing it
+        if not owns_driver:
+            raise
     except Exception as e:
         print(f"An error occurred: {str(e)}")
     finally:
-        driver.quit()
+        if owns_driver:
+            driver.quit()
 
     return products_data
 
+def scrape_with_pool(pool, search_term, num_products, search_url):
+    driver = pool.acquire()
+    try:
+        products_data = scrape_meesho_products(search_term, num_products, driver=driver, search_url=search_url)
+    except Exception:
+        pool.discard(driver)
+        raise
+    pool.release(driver)
+    return products_data
+
+def scrape_concurrently(search_terms, num_products=40, workers=3, on_products=None, search_url=SEARCH_URL):
+    """Scrape several search terms at once over a pool of `workers` drivers.
+
+    on_products(search_term, products_data) is called as soon as each term finishes.
+    """
+    pool = DriverPool(workers)
+    all_products_data = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(scrape_with_pool, pool, search_term, num_products, search_url): search_term
+                for search_term in search_terms
+            }
+            for future in as_completed(futures):
+                search_term = futures[future]
+                try:
+                    products_data = future.result()
+                except Exception as e:
+                    print(f"Scraping '{search_term}' failed: {str(e)}")
+                    products_data = []
+
+                if on_products:
+                    on_products(search_term, products_data)
+                all_products_data.extend(products_data)
+    finally:
+        pool.close()
+
+    return all_products_data
+
+class CrawlStore:
+    """Incremental, resumable crawl output keyed by Product URL.
+
+    Rows are appended to the CSV as each search term finishes. A product that
+    is already stored is only written again when one of its fields changed;
+    the newer row supersedes the older one. Next to the CSV, <filename>.state.json
+    keeps the URL index (URL -> row fingerprint) and the search terms that
+    completed, so an interrupted crawl resumes with the remaining terms. Once
+    every term of a crawl completed they are forgotten (finish()), so the next
+    run crawls all of them again and picks up new and changed products.
+    close() drops the superseded rows, so a closed CSV has one row per product
+    for the recommenders that read it with pd.read_csv.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.state_filename = filename + ".state.json"
+        self.index = {}
+        self.completed = set()
+        self.rows = 0  # Data rows in the CSV, superseded versions included
+        self.rows_written = 0
+        self.load()
+
+        new_file = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self.file = open(filename, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+        if new_file:
+            self.writer.writeheader()
+            self.file.flush()
+
+    def load(self):
+        # Without the CSV the state describes data that is gone: start over
+        if not os.path.exists(self.filename):
+            return
+        state = None
+        if os.path.exists(self.state_filename):
+            with open(self.state_filename, encoding='utf-8') as f:
+                state = json.load(f)
+            self.completed = set(state["completed"])
+
+        if state and state["size"] == os.path.getsize(self.filename):
+            self.index = state["index"]
+            self.rows = state["rows"]
+        else:
+            # Rows were appended after the last checkpoint (or the CSV was
+            # managed by hand): rebuild the index from the file itself
+            with open(self.filename, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    self.index[product_key(row)] = fingerprint(row)
+                    self.rows += 1
+
+    def checkpoint(self):
+        self.file.flush()
+        state = {
+            "size": os.path.getsize(self.filename),
+            "rows": self.rows,
+            "completed": sorted(self.completed),
+            "index": self.index,
+        }
+        tmp_filename = self.state_filename + ".tmp"
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_filename, self.state_filename)
+
+    def is_complete(self, search_term):
+        return search_term in self.completed
+
+    def upsert(self, products_data):
+        """Append new and changed products; returns (added, updated, unchanged) counts."""
+        added = updated = unchanged = 0
+        for row in products_data:
+            key = product_key(row)
+            row_fingerprint = fingerprint(row)
+            previous = self.index.get(key)
+            if previous == row_fingerprint:
+                unchanged += 1
+                continue
+            if previous is None:
+                added += 1
+            else:
+                updated += 1
+            self.writer.writerow(row)
+            self.index[key] = row_fingerprint
+            self.rows += 1
+        self.rows_written += added + updated
+        return added, updated, unchanged
+
+    def write(self, search_term, products_data):
+        if not products_data:
+            # Not checkpointed, so the next run retries this term
+            print(f"No data was scraped for {search_term}. Please check the website structure or your internet connection.")
+            return
+        added, updated, unchanged = self.upsert(products_data)
+        self.completed.add(search_term)
+        self.checkpoint()
+        print(f"Scraped {len(products_data)} products for {search_term}: {added} new, {updated} updated, {unchanged} unchanged")
+
+    def finish(self, search_terms):
+        """Start the next run from scratch if all search_terms completed; otherwise keep them for resuming."""
+        if all(self.is_complete(term) for term in search_terms):
+            self.reset_progress()
+
+    def reset_progress(self):
+        """Forget completed terms so they are crawled again (stored products still dedupe)."""
+        self.completed.clear()
+        self.checkpoint()
+
+    def compact(self):
+        """Rewrite the CSV with only the latest row per product."""
+        self.file.flush()
+        latest = {}
+        with open(self.filename, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                latest.pop(product_key(row), None)  # Keep the latest version, in its latest position
+                latest[product_key(row)] = row
+
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(latest.values())
+
+        self.file.close()
+        os.replace(tmp_filename, self.filename)
+        self.file = open(self.filename, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+        self.rows = len(latest)
+        self.checkpoint()
+
+    def close(self):
+        # Readers load the CSV as is, so leave no duplicate products behind
+        if self.rows > len(self.index):
+            self.compact()
+        self.file.close()
+
+def product_key(row):
+    # Cards without a link can't be matched across crawls by URL
+    if row["Product URL"] and row["Product URL"] != "N/A":
+        return row["Product URL"]
+    return f'{row["Query"]}\x1f{row["Title"]}\x1f{row["Price"]}'
+
+def fingerprint(row):
+    # The search term isn't part of the product: finding it again under a
+    # different query doesn't make it a changed product
+    values = "\x1f".join(row[field] or "" for field in CSV_FIELDS if field != "Query")
+    return hashlib.sha1(values.encode('utf-8')).hexdigest()
+
 def save_to_csv(data, filename):
     if not data:
         print("No data to save.")
         return
     
-    keys = ["Query", "Title", "Price", "Rating", "Reviews", "Image URL", "Product URL"]
     with open(filename, 'w', newline='', encoding='utf-8') as output_file:
-        dict_writer = csv.DictWriter(output_file, fieldnames=keys)
+        dict_writer = csv.DictWriter(output_file, fieldnames=CSV_FIELDS)
         dict_writer.writeheader()
         dict_writer.writerows(data)
 
-# Main execution
 # search_terms = ["men jeans", "women jeans", "kurta", "kurti", "women shirts", "men shirts", "men shoes", "women shoes", "men sweater", "women sweater", "men shorts", "women shorts", "jewellery", "belt"]
 search_terms = ["jewellery", "black kurti"]
-all_products_data = []
 
-for search_term in search_terms:
-    print(f"\nScraping products for: {search_term}")
-    products_data = scrape_meesho_products(search_term, num_products=40)  # Adjust num_products as needed
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape Meesho search results into a CSV file.")
+    parser.add_argument("terms", nargs="*", default=search_terms, help="search terms (default: %(default)s)")
+    parser.add_argument("--num-products", type=int, default=40)  # Adjust num_products as needed
+    parser.add_argument("--workers", type=int, default=3, help="number of browsers scraping in parallel")
+    parser.add_argument("--output", default="meesho_jewellery&black_kurti_data.csv")
+    parser.add_argument("--search-url", default=SEARCH_URL, help="search URL template with a {query} placeholder")
+    parser.add_argument("--recrawl", action="store_true", help="crawl terms again even if a previous run completed them")
+    args = parser.parse_args(argv)
+
+    output = CrawlStore(args.output)
+    try:
+        if args.recrawl:
+            output.reset_progress()
+        pending = [term for term in args.terms if not output.is_complete(term)]
+        skipped = len(args.terms) - len(pending)
+        if skipped:
+            print(f"Resuming: {skipped} search term(s) already crawled into {args.output}")
+        scrape_concurrently(pending, args.num_products, args.workers, output.write, args.search_url)
+        output.finish(args.terms)
+    finally:
+        output.close()
 
-    if products_data:
-        all_products_data.extend(products_data)
-        print(f"Scraped {len(products_data)} products for {search_term}")
+    if output.rows_written:
+        print(f"\n{output.rows_written} new or updated products saved to {args.output}")
     else:
-        print(f"No data was scraped for {search_term}. Please check the website structure or your internet connection.")
+        print("\nNo new or updated products.")
 
-if all_products_data:
-    filename = "meesho_jewellery&black_kurti_data.csv"
-    save_to_csv(all_products_data, filename)
-    print(f"\nAll data saved to {filename}")
-else:
-    print("\nNo data was scraped for any search term.")
+    print("\nScraping complete for all search terms.")
 
-print("\nScraping complete for all search terms.")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
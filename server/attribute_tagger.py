@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Derived product attributes (age_group, season, gender) from product_details.
+#
+# All descriptions are scanned together in one vectorized pass instead of one
+# .apply per attribute: a chunk of descriptions is joined into a single byte
+# buffer, split into words with numpy, and every word of a keyword's length
+# is packed into a uint64 and looked up among the packed keywords. Keywords
+# match whole words only, case-insensitively, so "woman" no longer counts as
+# "man". Each attribute takes the value of its highest-priority matching
+# keyword (the order of KEYWORDS), or its default when nothing matches.
+#
+# Words are runs of ASCII letters, digits and '_'; non-ASCII characters count
+# as word characters, so accented words are never split into keywords.
+#
+#   tagger = AttributeTagger()
+#   product_data[['age_group', 'season', 'gender']] = tagger.tag(product_data['product_details'])
+
+KEYWORDS = {
+    # attribute: (default, [(value, [keywords]), ...] in priority order)
+    'age_group': ('Adult', [
+        ('Kids', ['kid', 'kids']),
+    ]),
+    'season': ('All', [
+        ('Winter', ['winter']),
+        ('Summer', ['summer']),
+        ('Monsoon', ['monsoon']),
+        ('Autumn', ['autumn']),
+        ('Spring', ['spring']),
+    ]),
+    'gender': ('Unisex', [
+        ('Female', ['woman', 'women']),
+        ('Male', ['man', 'men']),
+    ]),
+}
+
+WORD_BYTES = 8  # Keywords are packed into one uint64
+CHUNK_ROWS = 100000
+
+# (1 << 8 * length) - 1 for every word length a keyword can have
+LENGTH_MASKS = np.array([(1 << 8 * length) - 1 for length in range(WORD_BYTES + 1)], dtype=np.uint64)
+
+def is_word_byte(buffer):
+    letters = (buffer | np.uint8(0x20)) - np.uint8(ord('a')) < 26
+    digits = buffer - np.uint8(ord('0')) < 10
+    return letters | digits | (buffer == ord('_')) | (buffer >= 0x80)
+
+def pack(keyword):
+    return int.from_bytes(keyword.encode('ascii'), 'little')
+
+class AttributeTagger:
+    def __init__(self, keywords=KEYWORDS):
+        self.columns = list(keywords)
+        self.values = {}      # attribute -> values in priority order, then the default
+        all_priorities = {}   # attribute -> {keyword: priority}
+        for attribute, (default, values) in keywords.items():
+            self.values[attribute] = np.array([value for value, _ in values] + [default], dtype=object)
+            all_priorities[attribute] = {}
+            for priority, (_, value_keywords) in enumerate(values):
+                for keyword in value_keywords:
+                    all_priorities[attribute].setdefault(keyword.lower(), priority)
+
+        all_keywords = sorted({keyword for priorities in all_priorities.values() for keyword in priorities})
+        for keyword in all_keywords:
+            if not (keyword.isascii() and len(keyword) <= WORD_BYTES and is_word_byte(np.frombuffer(keyword.encode(), dtype=np.uint8)).all()):
+                raise ValueError(f"Keyword {keyword!r} is not a single ASCII word of at most {WORD_BYTES} characters")
+
+        self.codes = np.array([pack(keyword) for keyword in all_keywords], dtype=np.uint64)
+        order = np.argsort(self.codes)
+        self.codes = self.codes[order]
+        self.lengths = np.unique([len(keyword) for keyword in all_keywords])
+        # attribute -> priority of each packed keyword, the default's position when it isn't one of the attribute's
+        self.priorities = {}
+        for attribute, priorities in all_priorities.items():
+            default_position = len(self.values[attribute]) - 1
+            self.priorities[attribute] = np.array([priorities.get(all_keywords[i], default_position) for i in order], dtype=np.int64)
+
+    def scan(self, texts):
+        """(row, keyword) positions of every keyword occurrence in a list of strings."""
+        # Rows end with a NUL; the padding lets every word start read WORD_BYTES bytes
+        buffer = np.frombuffer(('\x00'.join(texts) + '\x00').encode('utf-8') + b' ' * WORD_BYTES, dtype=np.uint8)
+        row_ends = np.flatnonzero(buffer == 0)
+        if len(row_ends) != len(texts):
+            return self.scan([text.replace('\x00', ' ') for text in texts])
+
+        word = is_word_byte(buffer).view(np.int8)
+        edges = np.diff(word, prepend=np.int8(0))
+        starts = np.flatnonzero(edges == 1)
+        lengths = np.flatnonzero(edges == -1) - starts
+        candidate = np.isin(lengths, self.lengths)
+        starts, lengths = starts[candidate], lengths[candidate]
+
+        packed = sliding_window_view(buffer, WORD_BYTES)[starts]
+        # ASCII lowercase; the keywords are lowercase and any other byte stays a non-letter
+        packed = packed | np.uint8(0x20)
+        packed = packed.view(np.uint64).ravel() & LENGTH_MASKS[lengths]
+
+        positions = np.searchsorted(self.codes, packed).clip(0, len(self.codes) - 1)
+        hit = self.codes[positions] == packed
+        return np.searchsorted(row_ends, starts[hit]), positions[hit]
+
+    def tag(self, details, columns=None):
+        """DataFrame of the derived columns (default: all of them) for a Series of product descriptions."""
+        columns = self.columns if columns is None else list(columns)
+        details = pd.Series(details)
+        # Missing descriptions get the defaults, like the old str(x) checks
+        texts = details.fillna('').astype(str).tolist()
+
+        positions = {attribute: np.full(len(texts), len(self.values[attribute]) - 1) for attribute in columns}
+        for start in range(0, len(texts), CHUNK_ROWS):
+            rows, keywords = self.scan(texts[start:start + CHUNK_ROWS])
+            for attribute in columns:
+                np.minimum.at(positions[attribute], rows + start, self.priorities[attribute][keywords])
+
+        return pd.DataFrame({attribute: self.values[attribute][positions[attribute]] for attribute in columns}, index=details.index)
+
+def add_attributes(products, tagger=None):
+    """Fill in whichever derived columns the products DataFrame doesn't already have, in place."""
+    tagger = tagger or AttributeTagger()
+    missing = [column for column in tagger.columns if column not in products.columns]
+    if missing:
+        tags = tagger.tag(products['product_details'], missing)
+        for column in missing:
+            products[column] = tags[column]
+    return products
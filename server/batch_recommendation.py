@@ -0,0 +1,112 @@
+import sys
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+import recommendation_handler as handler
+from user_profiles import build_profiles
+from candidate_index import top_k
+
+# Batch recommendations for many users at once (nightly email / push campaigns).
+#
+# All users are segmented with one vectorized predict, their profiles are built as
+# one sparse (users x features) matrix and scored against tfidf_matrix with one
+# sparse product per chunk, instead of running get_recommendations per user.
+# The scores stay sparse and each user only densifies its eligible candidates;
+# chunks are sized so that even a fully dense chunk of scores fits in
+# memory_budget bytes.
+
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+
+def chunk_rows(num_products, memory_budget, max_rows):
+    # Worst case every product shares a term with the profile: float64 score + int32 column per product
+    return max(1, min(max_rows, memory_budget // (12 * max(num_products, 1))))
+
+def candidate_scores(similarities, offset, candidates):
+    """Dense scores of the (sorted) candidate rows from one row of the sparse similarities; 0 where they share no terms."""
+    start, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+    columns, values = similarities.indices[start:end], similarities.data[start:end]
+    scores = np.zeros(len(candidates))
+    positions = np.searchsorted(candidates, columns)
+    hit = positions < len(candidates)
+    hit[hit] = candidates[positions[hit]] == columns[hit]
+    scores[positions[hit]] = values[hit]
+    return scores
+
+def segment_users(users):
+    return handler.segmentation.segment_users(users)
+
+def demographic_candidates(segment, eligibility_key, num_recommendations, cache):
+    # Same as recommendation_handler.initial_candidates. Most users share a
+    # handful of buckets, so results are memoized for the whole batch.
+    key = (segment, eligibility_key, num_recommendations)
+    if key not in cache:
+        eligible = handler.eligible_product_indices(*eligibility_key)
+        segment_product_ids, _ = handler.interaction_stream.top_products(segment)
+        cache[key] = handler.popular_first(eligible, segment_product_ids, num_recommendations)
+    return cache[key]
+
+def recommend_batch(users, num_recommendations=5, chunk_size=1024, month=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+    """Yield {'user_id', 'segment', 'recommendations'} for every row of the users DataFrame.
+    chunk_size: most users scored per sparse product, lowered to fit memory_budget (bytes)."""
+    month = month or datetime.now().month
+    users = users.reset_index(drop=True)
+    segments = segment_users(users)
+    product_ids = handler.product_data['product_id'].to_numpy()
+    demographic_cache = {}
+    chunk_size = chunk_rows(len(product_ids), memory_budget, chunk_size)
+
+    for start in range(0, len(users), chunk_size):
+        chunk = users.iloc[start:start + chunk_size]
+        interactions = handler.interaction_matrix.rows(chunk['user_id'].tolist())
+        similarities = (build_profiles(interactions, handler.tfidf_matrix) @ handler.tfidf_matrix.T).tocsr()
+
+        for offset, user in enumerate(chunk.itertuples(index=False)):
+            segment = segments[start + offset]
+            age_group = 'Kids' if user.age <= 12 else 'Adult'
+            season = handler.get_season(user.location, month)
+            eligibility_key = (season, age_group, user.gender)
+            eligible = handler.eligible_product_indices(*eligibility_key)
+
+            interacted = interactions.indices[interactions.indptr[offset]:interactions.indptr[offset + 1]]
+            if len(interacted) == 0:
+                rows = demographic_candidates(segment, eligibility_key, num_recommendations, demographic_cache)
+            else:
+                demographic_rows = demographic_candidates(segment, eligibility_key, num_recommendations * 2, demographic_cache)
+
+                candidates = eligible[~np.isin(eligible, interacted)]
+                # Ranked like recommendation_handler.recommend_updated (see with_demographic_content)
+                k = handler.num_content_candidates(num_recommendations, demographic_rows, len(candidates))
+                content_rows, _ = top_k(candidates, candidate_scores(similarities, offset, candidates), k)
+                content_rows = handler.with_demographic_content(content_rows, demographic_rows, interacted)
+
+                rows = handler.fusion.fuse({'demographic': demographic_rows, 'content': content_rows}, num_recommendations)
+
+            yield {
+                'user_id': user.user_id,
+                'segment': int(segment),
+                'recommendations': product_ids[np.asarray(rows, dtype=int)].tolist()
+            }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate recommendations for many users at once.')
+    parser.add_argument('users', nargs='?', default='existing_user_data.csv', help='CSV with user_id, name, age, gender, location columns')
+    parser.add_argument('-n', '--num-recommendations', type=int, default=5)
+    parser.add_argument('-o', '--output', help='JSON-lines output file (default: stdout)')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='most users per sparse product')
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_BUDGET // 2**20, help='score memory per chunk')
+    args = parser.parse_args(argv)
+
+    users = pd.read_csv(args.users)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for result in recommend_batch(users, args.num_recommendations, args.chunk_size, memory_budget=args.memory_mb * 2**20):
+            output.write(json.dumps(result) + '\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Load time of a scraper catalog: pd.read_csv + numeric parsing of Rating and
+# Reviews (what the initial recommenders did on every start) against opening
+# the memory-mapped typed catalog written by catalog.py. Runs on a synthetic
+# scraper CSV in a temporary directory.
+#
+#   python benchmarks/bench_catalog.py --rows 1000000
+
+def write_scraper_csv(path, rows, rng):
+    queries = np.array(['men jeans', 'women jeans', 'kurti', 'jewellery', 'men shoes', 'belt'])
+    ratings = np.round(rng.uniform(1, 5, rows), 1).astype(str)
+    reviews = rng.integers(0, 50000, rows).astype(str)
+    # Roughly what the scraper produces for cards without ratings
+    missing = rng.random(rows) < 0.05
+    ratings[missing] = 'N/A'
+    reviews[missing] = 'N/A'
+    ids = np.arange(rows).astype(str)
+    pd.DataFrame({
+        'Query': queries[rng.integers(0, len(queries), rows)],
+        'Title': np.char.add('Stylish Product ', ids),
+        'Price': rng.integers(99, 2000, rows),
+        'Rating': ratings,
+        'Reviews': reviews,
+        'Image URL': np.char.add('https://images.meesho.com/images/products/', np.char.add(ids, '/x_400.webp')),
+        'Product URL': np.char.add('https://www.meesho.com/product/p/', ids),
+    }).to_csv(path, index=False)
+
+def load_csv(path):
+    products = pd.read_csv(path)
+    return pd.to_numeric(products['Rating'], errors='coerce'), pd.to_numeric(products['Reviews'], errors='coerce')
+
+def load_columnar(load_catalog, path):
+    catalog = load_catalog(path)
+    return catalog.numeric('Rating'), catalog.numeric('Reviews')
+
+def best_of(function, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e3
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark catalog load time.')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Keep the benchmark's snapshots out of the real artifacts/ directory
+        os.environ['RECOMMENDER_ARTIFACTS'] = directory
+        os.environ.pop('RECOMMENDER_REFIT', None)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from catalog import ingest, load_catalog
+
+        path = os.path.join(directory, 'products.csv')
+        write_scraper_csv(path, args.rows, np.random.default_rng(args.seed))
+
+        start = time.perf_counter()
+        ingest(path)
+        ingest_ms = (time.perf_counter() - start) * 1e3
+
+        csv_ms = best_of(load_csv, args.repeat, path)
+        columnar_ms = best_of(load_columnar, args.repeat, load_catalog, path)
+
+    print(f"rows={args.rows} repeat={args.repeat} (best of)")
+    print(f"  one-off ingest: {ingest_ms:9.1f} ms")
+    print(f"     pd.read_csv: {csv_ms:9.1f} ms")
+    print(f"  mmap'd catalog: {columnar_ms:9.1f} ms")
+    print(f"speedup: {csv_ms / columnar_ms:.1f}x")
+
+if __name__ == '__main__':
+    main()
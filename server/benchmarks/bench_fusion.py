@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fusion import Fusion
+
+# Per-request latency of hybrid score fusion: the old DataFrame + isin +
+# drop_duplicates + sort_values block from app.py's hybrid_recommendation
+# against fusion.Fusion on row-position arrays.
+#
+#   python benchmarks/bench_fusion.py --catalog 100000 --num 10 --requests 2000
+
+WEIGHTS = {'demographic': 1, 'content': 2, 'collaborative': 3}
+
+def pandas_fusion(demographic_recs, content_recs, collaborative_recs, interacted_products, num_recommendations):
+    recs = pd.DataFrame({'product_id': demographic_recs + content_recs + collaborative_recs})
+    recs['score'] = 0
+    recs.loc[recs['product_id'].isin(demographic_recs), 'score'] += 1
+    recs.loc[recs['product_id'].isin(content_recs), 'score'] += 2
+    recs.loc[recs['product_id'].isin(collaborative_recs), 'score'] += 3
+    recs = recs[~recs['product_id'].isin(interacted_products)]
+    top_recs = recs.sort_values('score', ascending=False)['product_id'].drop_duplicates().head(num_recommendations)
+    return top_recs.tolist()
+
+def time_calls(function, requests):
+    timings = []
+    for request in requests:
+        start = time.perf_counter()
+        function(*request)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark hybrid score fusion.')
+    parser.add_argument('--catalog', type=int, default=100000)
+    parser.add_argument('--num', type=int, default=10, help='recommendations per request')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    # Sources overlap heavily in practice, so draw them from a shared pool of popular products
+    pool = rng.choice(args.catalog, size=args.num * 8, replace=False)
+
+    pandas_requests = []
+    array_requests = []
+    fusion = Fusion(WEIGHTS)
+    for _ in range(args.requests):
+        lists = [rng.choice(pool, size=args.num * 2, replace=False) for _ in WEIGHTS]
+        interacted = rng.choice(pool, size=args.num, replace=False)
+        exclude = np.zeros(args.catalog, dtype=bool)
+        exclude[interacted] = True
+
+        pandas_requests.append([ranked.tolist() for ranked in lists] + [interacted.tolist(), args.num])
+        array_requests.append((dict(zip(WEIGHTS, lists)), args.num, exclude))
+
+    results = {
+        'pandas': time_calls(pandas_fusion, pandas_requests),
+        'fusion': time_calls(fusion.fuse, array_requests),
+    }
+
+    print(f"catalog={args.catalog} num={args.num} requests={args.requests}")
+    for name, timings in results.items():
+        print(f"{name:>8}: p50 {np.percentile(timings, 50):9.1f} us   p99 {np.percentile(timings, 99):9.1f} us")
+    speedup = np.percentile(results['pandas'], 50) / np.percentile(results['fusion'], 50)
+    print(f"speedup (p50): {speedup:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pipeline
+
+# Throughput of the sharded batch pipeline against the number of worker
+# processes, on a synthetic users CSV drawn from the demographics in
+# existing_user_data.csv. Worker start-up (importing recommendation_handler)
+# is included, as it is for a real run.
+#
+#   python benchmarks/bench_pipeline.py --users 200000 --workers 1 2 4 8
+
+def write_users_csv(path, num_users, rng):
+    existing = pd.read_csv(os.path.join(pipeline.SERVER_DIR, 'existing_user_data.csv'))
+    sample = existing.iloc[rng.integers(0, len(existing), num_users)].reset_index(drop=True)
+    # Half the ids are real users (with interactions), the rest are unknown
+    known = rng.random(num_users) < 0.5
+    sample['user_id'] = np.where(known, sample['user_id'], np.arange(num_users) + 10 ** 6)
+    sample.to_csv(path, index=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the sharded batch pipeline.')
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--shard-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    pipeline.ensure_snapshot()
+    options = {'num_recommendations': 5, 'chunk_size': 1024, 'month': 6}
+    with tempfile.TemporaryDirectory() as tmp:
+        users_path = os.path.join(tmp, 'users.csv')
+        write_users_csv(users_path, args.users, np.random.default_rng(args.seed))
+
+        print(f"users={args.users} shard_size={args.shard_size} cores={os.cpu_count()}")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            with open(os.path.join(tmp, 'out.jsonl'), 'w') as output:
+                pipeline.run('users', pipeline.user_shards(users_path, args.shard_size), output, workers, options)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>3} workers: {elapsed:8.2f} s   {args.users / elapsed:10.0f} users/s   speedup {baseline / elapsed:.2f}x")
+
+if __name__ == '__main__':
+    main()
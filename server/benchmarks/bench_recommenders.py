@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import importlib
+import subprocess
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCHMARKS_DIR)
+ROOT_DIR = os.path.dirname(SERVER_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+from synthetic_data import generate
+
+# End-to-end recommender benchmarks on synthetic data (synthetic_data.py).
+#
+# For every scale, each target runs in its own interpreter on freshly
+# generated CSVs and reports
+#
+#   load_s       reading the CSVs
+#   startup_s    everything the service does before it can answer: reading
+#                the CSVs and fitting its models (RECOMMENDER_REFIT, no snapshot)
+#   requests     per-request latency (p50 / p99 / mean, ms) of each entry point
+#                on a sample of users, with the result cache disabled
+#   peak_rss_mb  peak resident memory of the process
+#
+# Targets: handler (recommendation_handler.py), update
+# (update_recommendation.py) and app (../app.py). app.py's tables are inline,
+# so its benchmark swaps the synthetic ones in and refits its models the way
+# app.py does before timing hybrid_recommendation / recommend_collaborative.
+#
+# The report is JSON; pass an earlier report with --compare to print the
+# ratios against it.
+#
+#   python benchmarks/bench_recommenders.py --scales 1000 10000 100000 -o report.json
+#   python benchmarks/bench_recommenders.py --scales 100000 --compare report.json
+
+TARGETS = ['handler', 'update', 'app']
+CSV_FILES = ['product_data.csv', 'product_url.csv', 'existing_user_data.csv', 'interaction_data.csv']
+
+# app.py's collaborative filter needs explicit ratings
+INTERACTION_RATINGS = {'view': 2, 'click': 3, 'add_to_cart': 4, 'purchase': 5}
+
+def summarize(timings):
+    timings = np.asarray(timings) * 1000
+    return {
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'mean_ms': float(timings.mean()),
+        'count': len(timings),
+    }
+
+def time_requests(entry_points, arguments):
+    results = {}
+    for name, function in entry_points.items():
+        timings = []
+        for args in arguments:
+            start = time.perf_counter()
+            function(*args)
+            timings.append(time.perf_counter() - start)
+        results[name] = summarize(timings)
+    return results
+
+def user_sample(users, num_requests, seed):
+    return users.sample(min(num_requests, len(users)), replace=False, random_state=seed)
+
+def user_info(user):
+    return {'user_id': user.user_id, 'name': user.name, 'age': int(user.age), 'gender': user.gender, 'location': user.location}
+
+def bench_server_module(module_name, num_requests, seed):
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    # Lazily built models count as start-up, not as the first request
+    if hasattr(module, 'warm_up'):
+        module.warm_up()
+    startup = time.perf_counter() - start
+    if hasattr(module, 'result_cache'):
+        module.result_cache.max_entries = 0
+
+    arguments = []
+    for user in user_sample(module.existing_user_data, num_requests, seed).itertuples(index=False):
+        info = user_info(user)
+        arguments.append((info, module.segmentation.segment(info)))
+    requests = time_requests({
+        'recommend_initial': module.recommend_initial,
+        'recommend_updated': module.recommend_updated,
+    }, arguments)
+    return startup, requests
+
+def bench_handler(num_requests, seed):
+    return bench_server_module('recommendation_handler', num_requests, seed)
+
+def bench_update(num_requests, seed):
+    return bench_server_module('update_recommendation', num_requests, seed)
+
+def bench_app(num_requests, seed):
+    from sklearn.cluster import KMeans
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from surprise import Dataset, Reader, SVD
+    from user_profiles import InteractionMatrix
+    from candidate_index import build_candidate_index
+    from svd_scoring import SVDScorer
+
+    start = time.perf_counter()
+    app = importlib.import_module('app')
+    app.warm_up()
+    users = pd.read_csv('existing_user_data.csv')[['user_id', 'age', 'gender', 'location']]
+    products = pd.read_csv('product_data.csv')
+    interactions = pd.read_csv('interaction_data.csv')
+
+    # The same steps as app.py, on the synthetic tables
+    features = pd.get_dummies(users, columns=['gender', 'location']).drop('user_id', axis=1)
+    users['segment'] = KMeans(n_clusters=2, random_state=42).fit(features).predict(features)
+    interactions['rating'] = interactions['interaction_type'].map(INTERACTION_RATINGS)
+    interactions = interactions.merge(users[['user_id', 'segment']], on='user_id')
+    products['combined_features'] = products['product_details']
+    app.tfidf_matrix = TfidfVectorizer().fit_transform(products['combined_features'])
+    app.product_data = products
+    app.interaction_data = interactions
+    app.interaction_matrix = InteractionMatrix(interactions, products['product_id'])
+    app.content_index = build_candidate_index(app.tfidf_matrix)
+    algo = SVD()
+    algo.fit(Dataset.load_from_df(interactions[['user_id', 'product_id', 'rating']], Reader(rating_scale=(1, 5))).build_full_trainset())
+    app.algo = algo
+    app.svd_scorer = SVDScorer(algo, products['product_id'])
+    popular_products = interactions.groupby(['segment', 'product_id']).size().reset_index(name='counts')
+    app.top_products_per_segment = popular_products.sort_values(['segment', 'counts'], ascending=False).groupby('segment').head(2)
+    startup = time.perf_counter() - start
+
+    sample = user_sample(users, num_requests, seed)
+    requests = time_requests({
+        'hybrid_recommendation': app.hybrid_recommendation,
+        'recommend_collaborative': lambda user_id, segment: app.recommend_collaborative(user_id),
+    }, list(zip(sample['user_id'].tolist(), sample['segment'].tolist())))
+    return startup, requests
+
+BENCHMARKS = {
+    'handler': bench_handler,
+    'update': bench_update,
+    'app': bench_app,
+}
+
+def run_worker(target, data_dir, num_requests, seed, result_path):
+    """Runs in the child interpreter: benchmark one target on the CSVs in data_dir."""
+    import resource
+
+    os.chdir(data_dir)
+    sys.path.insert(0, SERVER_DIR)
+    sys.path.insert(0, ROOT_DIR)
+
+    start = time.perf_counter()
+    for csv_file in CSV_FILES:
+        pd.read_csv(csv_file)
+    load = time.perf_counter() - start
+
+    startup, requests = BENCHMARKS[target](num_requests, seed)
+    result = {
+        'load_s': load,
+        'startup_s': startup,
+        'requests': requests,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+
+def run_target(target, data_dir, num_requests, seed, timeout):
+    result_path = os.path.join(data_dir, f'result-{target}.json')
+    env = dict(os.environ, RECOMMENDER_REFIT='1', RECOMMENDER_ARTIFACTS=os.path.join(data_dir, 'artifacts'))
+    command = [sys.executable, os.path.abspath(__file__), '--worker', target, '--data', data_dir,
+               '--requests', str(num_requests), '--seed', str(seed), '--result', result_path]
+    try:
+        completed = subprocess.run(command, env=env, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': f'timed out after {timeout} s'}
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f'exit code {completed.returncode}'}
+    with open(result_path) as f:
+        return json.load(f)
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=ROOT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    import sklearn
+    import scipy
+    return {
+        'version': git_version(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'scipy': scipy.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def result_key(result):
+    return (result['products'], result['users'], result['interactions'], result['target'])
+
+def print_result(result, baseline=None):
+    label = f"{result['target']:>8} products={result['products']} users={result['users']} interactions={result['interactions']}"
+    if 'error' in result:
+        print(f"{label}: {result['error']}")
+        return
+
+    def compared(metric, value, old_value):
+        ratio = f" ({value / old_value:.2f}x)" if old_value else ''
+        return f"{metric} {value:.3f}{ratio}"
+
+    old = baseline or {}
+    print(f"{label}: {compared('load', result['load_s'], old.get('load_s'))} s, "
+          f"{compared('startup', result['startup_s'], old.get('startup_s'))} s, "
+          f"{compared('peak', result['peak_rss_mb'], old.get('peak_rss_mb'))} MB")
+    for name, timings in result['requests'].items():
+        old_timings = old.get('requests', {}).get(name, {})
+        print(f"{'':>10}{name:<24} {compared('p50', timings['p50_ms'], old_timings.get('p50_ms'))} ms   "
+              f"{compared('p99', timings['p99_ms'], old_timings.get('p99_ms'))} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the recommenders on synthetic data.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000], help='products and users per run')
+    parser.add_argument('--interactions-per-user', type=int, default=10)
+    parser.add_argument('--targets', nargs='+', choices=TARGETS, default=TARGETS)
+    parser.add_argument('--requests', type=int, default=200, help='users sampled per entry point')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=3600, help='seconds per target and scale')
+    parser.add_argument('-o', '--output', default='benchmark_report.json')
+    parser.add_argument('--compare', help='earlier report to compare against')
+    parser.add_argument('--worker', choices=TARGETS, help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.worker, args.data, args.requests, args.seed, args.result)
+        return
+
+    baselines = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baselines = {result_key(result): result for result in json.load(f)['results'] if 'error' not in result}
+
+    report = {'environment': environment(), 'results': []}
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix=f'bench-{scale}-') as data_dir:
+            sizes = {'products': scale, 'users': scale, 'interactions': scale * args.interactions_per_user}
+            generate(data_dir, sizes['products'], sizes['users'], sizes['interactions'], args.seed)
+            for target in args.targets:
+                result = {'target': target, **sizes, **run_target(target, data_dir, args.requests, args.seed, args.timeout)}
+                report['results'].append(result)
+                print_result(result, baselines.get(result_key(result)))
+
+        # Written after every scale so a long run that dies part-way still leaves a report
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Report: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(SERVER_DIR)
+
+# Time to first response of each entry point, from a cold interpreter, run
+# under python -X importtime so the report also says which imports the time
+# went into. Runs against the current snapshots (or fits, if there are none).
+#
+#   initial    recommendation_handler.py CLI, login_count == 0
+#   updated    recommendation_handler.py CLI, login_count == 1
+#   app        import app + the first /recommend request
+#   worker     recommendation_worker.py: ready message + first answer
+#
+#   python benchmarks/bench_startup.py --repeat 5 -o startup.json
+
+USER_ARGS = ['1', 'User1', '22', 'Female', 'Chennai']
+
+APP_SCRIPT = "import app; app.app.test_client().get('/recommend?user_id=1')"
+
+WORKER_SCRIPT = """
+import sys, json, io, contextlib
+sys.argv = ['recommendation_worker.py', 'dummy_recommendation']
+sys.stdin = io.StringIO(json.dumps({'id': 1, 'email': 'a@b.c', 'name': 'A', 'age': 22, 'gender': 'female', 'city': 'Delhi', 'page': 0}) + '\\n')
+import recommendation_worker
+recommendation_worker.serve('dummy_recommendation')
+"""
+
+ENTRY_POINTS = {
+    'initial': (SERVER_DIR, ['recommendation_handler.py'] + USER_ARGS + ['0']),
+    'updated': (SERVER_DIR, ['recommendation_handler.py'] + USER_ARGS + ['1']),
+    'app': (ROOT_DIR, ['-c', APP_SCRIPT]),
+    'worker': (SERVER_DIR, ['-c', WORKER_SCRIPT]),
+}
+
+def parse_importtime(stderr):
+    """(total import seconds, {top-level module: cumulative seconds}) from -X importtime output."""
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that triggered them
+        if not name[1:].startswith(' '):
+            top_level[name.strip()] = top_level.get(name.strip(), 0.0) + int(cumulative) / 1e6
+    return sum(top_level.values()), top_level
+
+def run_once(entry_point):
+    cwd, args = ENTRY_POINTS[entry_point]
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=cwd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{entry_point} failed: {completed.stderr.strip().splitlines()[-1]}")
+    imports, modules = parse_importtime(completed.stderr)
+    return elapsed, imports, modules
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure cold-start time to first response.')
+    parser.add_argument('entry_points', nargs='*', default=list(ENTRY_POINTS), help=f"{', '.join(ENTRY_POINTS)} (default: all)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8, help='heaviest top-level imports to report')
+    parser.add_argument('-o', '--output', help='JSON report')
+    args = parser.parse_args(argv)
+
+    report = {}
+    for entry_point in args.entry_points:
+        runs = [run_once(entry_point) for _ in range(args.repeat)]
+        totals = np.array([run[0] for run in runs])
+        imports = np.array([run[1] for run in runs])
+        # Heaviest imports of the median run
+        _, _, modules = runs[int(np.argsort(totals)[len(totals) // 2])]
+        heaviest = dict(sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top])
+        report[entry_point] = {
+            'first_response_s': float(np.median(totals)),
+            'first_response_min_s': float(totals.min()),
+            'imports_s': float(np.median(imports)),
+            'heaviest_imports_s': heaviest,
+        }
+        print(f"{entry_point:>8}: first response {np.median(totals):6.2f} s (min {totals.min():.2f}), imports {np.median(imports):6.2f} s")
+        print(f"{'':>10}{', '.join(f'{name} {seconds:.2f}' for name, seconds in heaviest.items())}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
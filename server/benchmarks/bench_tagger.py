@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from attribute_tagger import AttributeTagger
+from synthetic_data import products_chunk
+
+# Deriving age_group / season / gender from product_details: the three
+# row-wise .apply calls the recommenders used (each lowercasing every
+# description again and running substring checks) against the vectorized
+# AttributeTagger. Also counts the rows where word boundaries change the
+# result ("woman" no longer matching "man", "menswear" no longer Male, ...).
+#
+#   python benchmarks/bench_tagger.py --rows 1000000
+
+def assign_season(details):
+    details_lower = str(details).lower()
+    if 'winter' in details_lower:
+        return 'Winter'
+    elif 'summer' in details_lower:
+        return 'Summer'
+    elif 'monsoon' in details_lower:
+        return 'Monsoon'
+    elif 'autumn' in details_lower:
+        return 'Autumn'
+    elif 'spring' in details_lower:
+        return 'Spring'
+    else:
+        return 'All'
+
+def assign_gender(detail):
+    detail_lower = str(detail).lower()
+    if 'woman' in detail_lower or 'women' in detail_lower:
+        return 'Female'
+    elif 'man' in detail_lower or 'men' in detail_lower:
+        return 'Male'
+    else:
+        return 'Unisex'
+
+def apply_tags(details):
+    return pd.DataFrame({
+        'age_group': details.apply(lambda x: 'Kids' if 'kid' in str(x).lower() else 'Adult'),
+        'season': details.apply(assign_season),
+        'gender': details.apply(assign_gender),
+    })
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark product attribute derivation.')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    details = products_chunk(np.random.default_rng(args.seed), 0, args.rows)['product_details']
+    # Some descriptions in the style the scraper produces, with words that only contain the keywords
+    details.iloc[::7] = details.iloc[::7] + ' Menswear for the sportsman'
+
+    apply_seconds, old = best_of(lambda: apply_tags(details), args.repeat)
+    tagger = AttributeTagger()
+    tagger_seconds, new = best_of(lambda: tagger.tag(details), args.repeat)
+
+    print(f"rows={args.rows}")
+    print(f"   apply: {apply_seconds:8.3f} s")
+    print(f"  tagger: {tagger_seconds:8.3f} s   speedup {apply_seconds / tagger_seconds:.1f}x")
+    for column in tagger.columns:
+        changed = old[column].to_numpy() != new[column].to_numpy()
+        print(f"  {column:>9}: {changed.sum()} rows tagged differently")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_data import products_chunk
+
+# Cost of onboarding new products: refitting TfidfVectorizer over the whole
+# catalog (what every start did once product_data.csv changed) against
+# bringing a published TfidfIndex up to date, which tokenizes only the new
+# products. Runs on synthetic products, with the index snapshots in a
+# temporary directory.
+#
+#   python benchmarks/bench_tfidf_index.py --products 1000000 --new 1000
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark incremental TF-IDF indexing against refitting.')
+    parser.add_argument('--products', type=int, default=100000, help='products already indexed')
+    parser.add_argument('--new', type=int, nargs='+', default=[1, 100, 1000], help='products added')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='bench-tfidf-') as artifacts:
+        # model_artifacts reads the root at import
+        os.environ['RECOMMENDER_ARTIFACTS'] = artifacts
+        os.environ.pop('RECOMMENDER_REFIT', None)
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        import tfidf_index
+        from tfidf_index import TfidfIndex
+
+        # Incremental rows only; this measures the update itself, not the occasional idf refresh
+        tfidf_index.REFRESH_FRACTION = float('inf')
+
+        products = products_chunk(np.random.default_rng(args.seed), 0, args.products + max(args.new))
+        base = products.iloc[:args.products]
+        start = time.perf_counter()
+        TfidfIndex.fit(base['product_id'], base['product_details'], stop_words='english').publish()
+        print(f"products={args.products}: initial fit + publish {time.perf_counter() - start:.3f} s")
+
+        for new in args.new:
+            catalog = products.iloc[:args.products + new]
+            refit_seconds, _ = best_of(lambda: TfidfVectorizer(stop_words='english').fit_transform(catalog['product_details']), args.repeat)
+
+            def incremental():
+                index, _ = TfidfIndex.load_or_fit(catalog['product_id'], catalog['product_details'], stop_words='english')
+                return index, index.matrix(catalog['product_id'])
+            update_seconds, (index, matrix) = best_of(incremental, args.repeat)
+            publish_seconds, _ = best_of(index.publish, 1)
+            # Publishing made this catalog CURRENT; start the next size from the base index again
+            TfidfIndex.fit(base['product_id'], base['product_details'], stop_words='english').publish()
+
+            print(f"  +{new:<8} refit {refit_seconds:8.3f} s   update {update_seconds:8.3f} s   speedup {refit_seconds / update_seconds:6.1f}x"
+                  f"   (publish {publish_seconds:.3f} s, matrix {matrix.shape})")
+
+if __name__ == '__main__':
+    main()
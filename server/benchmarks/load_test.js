@@ -0,0 +1,75 @@
+const http = require("http");
+
+// Local load test for POST /api/initial-recommendation: keeps `concurrency`
+// requests in flight for `duration` seconds and reports throughput, latency
+// percentiles and status codes (503 = shed by the queue limit, 504 = timed out).
+// Start server.js first.
+//
+//   node benchmarks/load_test.js --concurrency 64 --duration 20 --email someone@example.com
+
+function parseArgs(argv) {
+    const args = { url: "http://localhost:5001/api/initial-recommendation", concurrency: 32, duration: 10, email: null };
+    for (let i = 0; i < argv.length; i += 2) {
+        const key = argv[i].replace(/^--/, "");
+        if (!(key in args)) {
+            throw new Error(`Unknown option ${argv[i]}`);
+        }
+        args[key] = typeof args[key] === "number" ? Number(argv[i + 1]) : argv[i + 1];
+    }
+    if (!args.email) {
+        args.email = require("../users.json")[0].email;
+    }
+    return args;
+}
+
+function post(url, body, agent) {
+    return new Promise((resolve) => {
+        const start = process.hrtime.bigint();
+        const request = http.request(url, { method: "POST", agent, headers: { "Content-Type": "application/json" } }, (response) => {
+            response.resume();
+            response.on("end", () => resolve({ status: response.statusCode, ms: Number(process.hrtime.bigint() - start) / 1e6 }));
+        });
+        request.on("error", () => resolve({ status: "error", ms: Number(process.hrtime.bigint() - start) / 1e6 }));
+        request.end(JSON.stringify(body));
+    });
+}
+
+function percentile(sorted, p) {
+    if (sorted.length === 0) {
+        return NaN;
+    }
+    return sorted[Math.min(sorted.length - 1, Math.floor((p / 100) * sorted.length))];
+}
+
+async function main() {
+    const args = parseArgs(process.argv.slice(2));
+    const agent = new http.Agent({ keepAlive: true, maxSockets: args.concurrency });
+    const deadline = Date.now() + args.duration * 1000;
+    const results = [];
+
+    const client = async () => {
+        let page = 0;
+        while (Date.now() < deadline) {
+            results.push(await post(args.url, { email: args.email, page: page++ % 10 }, agent));
+        }
+    };
+    const start = Date.now();
+    await Promise.all(Array.from({ length: args.concurrency }, client));
+    const elapsed = (Date.now() - start) / 1000;
+    agent.destroy();
+
+    const statuses = {};
+    for (const result of results) {
+        statuses[result.status] = (statuses[result.status] || 0) + 1;
+    }
+    const ok = results.filter((result) => result.status === 200).map((result) => result.ms).sort((a, b) => a - b);
+    const all = results.map((result) => result.ms).sort((a, b) => a - b);
+
+    console.log(`concurrency=${args.concurrency} duration=${args.duration}s requests=${results.length}`);
+    console.log(`throughput: ${(results.length / elapsed).toFixed(1)} req/s (${(ok.length / elapsed).toFixed(1)} ok/s)`);
+    console.log(`latency (200): p50 ${percentile(ok, 50).toFixed(1)} ms   p99 ${percentile(ok, 99).toFixed(1)} ms`);
+    console.log(`latency (all): p50 ${percentile(all, 50).toFixed(1)} ms   p99 ${percentile(all, 99).toFixed(1)} ms`);
+    console.log(`statuses: ${JSON.stringify(statuses)}`);
+}
+
+main();
@@ -0,0 +1,101 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+# Synthetic recommender data in the schema of the shipped CSVs:
+#
+#   product_data.csv         product_id, product_details, product_image_url, gender
+#   product_url.csv          product_id, product_url
+#   existing_user_data.csv   user_id, name, age, gender, location
+#   interaction_data.csv     user_id, product_id, interaction_type, timestamp
+#
+# Product descriptions mix the words the recommenders key on (seasons, kids,
+# women / men) with a random vocabulary, product popularity is Zipf-skewed and
+# every file is written in chunks, so 10^7 rows fit in a few hundred MB.
+#
+#   python benchmarks/synthetic_data.py data/ --products 100000 --users 100000 --interactions 1000000
+
+CHUNK_SIZE = 1000000
+
+BRANDS = np.array(['Myra', 'Aagam', 'Mahi Creation', 'Blushh', 'Kashvi', 'Anvi', 'Fabrico', 'Stylish'])
+ITEMS = np.array(['Kurti', 'Kurta', 'Saree', 'Dress', 'Jeans', 'Shirt', 'T-Shirt', 'Sweater', 'Jacket', 'Dupatta', 'Lehenga', 'Shoes'])
+FABRICS = np.array(['Cotton', 'Rayon', 'Georgette', 'Silk', 'Denim', 'Woollen', 'Linen', 'Chiffon'])
+STYLES = np.array(['Printed', 'Solid', 'Striped', 'Embroidered', 'A-Line', 'Straight', 'Flared', 'Slim Fit'])
+SEASON_WORDS = np.array(['', '', '', 'Winter', 'Summer', 'Monsoon', 'Autumn', 'Spring'])
+AUDIENCES = np.array(["Women's", "Men's", 'Kids', 'Unisex'])
+AUDIENCE_GENDERS = np.array(['Female', 'Male', 'Unisex', 'Unisex'])
+LOCATIONS = np.array(['Delhi', 'Mumbai', 'Chennai', 'Kolkata', 'Bengaluru'])
+INTERACTION_TYPES = np.array(['view', 'click', 'add_to_cart', 'purchase'])
+INTERACTION_PROBABILITIES = [0.6, 0.25, 0.1, 0.05]
+
+def write_chunks(path, total, make_chunk):
+    for number, start in enumerate(range(0, total, CHUNK_SIZE)):
+        make_chunk(start, min(start + CHUNK_SIZE, total)).to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+    if total == 0:
+        make_chunk(0, 0).to_csv(path, index=False)
+
+def products_chunk(rng, start, end):
+    count = end - start
+    product_ids = np.arange(start + 1, end + 1)
+    audience = rng.integers(0, len(AUDIENCES), count)
+    details = pd.Series(np.char.add('Name:', BRANDS[rng.integers(0, len(BRANDS), count)]))
+    for words in (AUDIENCES[audience], STYLES[rng.integers(0, len(STYLES), count)],
+                  FABRICS[rng.integers(0, len(FABRICS), count)], ITEMS[rng.integers(0, len(ITEMS), count)],
+                  SEASON_WORDS[rng.integers(0, len(SEASON_WORDS), count)]):
+        details = details.str.cat(words, sep=' ')
+    return pd.DataFrame({
+        'product_id': product_ids,
+        'product_details': details.str.strip(),
+        'product_image_url': [f'https://images.meesho.com/images/products/{product_id}/synthetic_512.webp' for product_id in product_ids.tolist()],
+        'gender': AUDIENCE_GENDERS[audience],
+    })
+
+def users_chunk(rng, start, end):
+    user_ids = np.arange(start + 1, end + 1)
+    return pd.DataFrame({
+        'user_id': user_ids,
+        'name': np.char.add('User', user_ids.astype(str)),
+        'age': rng.integers(5, 66, end - start),
+        'gender': np.array(['Female', 'Male'])[rng.integers(0, 2, end - start)],
+        'location': LOCATIONS[rng.integers(0, len(LOCATIONS), end - start)],
+    })
+
+def interactions_chunk(rng, start, end, num_products, num_users):
+    count = end - start
+    # Zipf-distributed popularity, shuffled so popular products aren't just the low ids
+    ranks = (rng.zipf(1.3, count) - 1) % max(num_products, 1)
+    product_ids = (ranks * 2654435761 % max(num_products, 1)) + 1
+    days = rng.integers(0, 365, count)
+    return pd.DataFrame({
+        'user_id': rng.integers(1, num_users + 1, count),
+        'product_id': product_ids,
+        'interaction_type': INTERACTION_TYPES[rng.choice(len(INTERACTION_TYPES), count, p=INTERACTION_PROBABILITIES)],
+        'timestamp': (np.datetime64('2024-01-01') + days).astype(str),
+    })
+
+def generate(directory, num_products, num_users, num_interactions, seed=42):
+    """Write the four CSVs into directory."""
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    write_chunks(os.path.join(directory, 'product_data.csv'), num_products, lambda start, end: products_chunk(rng, start, end))
+    write_chunks(os.path.join(directory, 'product_url.csv'), num_products, lambda start, end: pd.DataFrame({
+        'product_id': np.arange(start + 1, end + 1),
+        'product_url': [f'https://www.meesho.com/p/{product_id}' for product_id in range(start + 1, end + 1)],
+    }))
+    write_chunks(os.path.join(directory, 'existing_user_data.csv'), num_users, lambda start, end: users_chunk(rng, start, end))
+    write_chunks(os.path.join(directory, 'interaction_data.csv'), num_interactions,
+                 lambda start, end: interactions_chunk(rng, start, end, num_products, num_users))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic product, user and interaction CSVs.')
+    parser.add_argument('directory')
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--interactions', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    generate(args.directory, args.products, args.users, args.interactions, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import os
+import sys
+import argparse
+import importlib
+
+# Offline model build: fit KMeans / TF-IDF / SVD once and publish a versioned
+# snapshot under artifacts/ that the services load at start-up.
+#
+#   python build_artifacts.py                 # all targets
+#   python build_artifacts.py recommender     # recommendation_handler.py + update_recommendation.py
+#   python build_artifacts.py app             # ../app.py
+#   python build_artifacts.py catalog         # typed scraper catalogs (catalog.py)
+#   python build_artifacts.py similarity      # item-item similarity table (item_similarity.py)
+#   python build_artifacts.py tfidf           # incremental TF-IDF index, refitted from scratch (tfidf_index.py)
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = {
+    'recommender': 'recommendation_handler',
+    'app': 'app',
+    'catalog': 'catalog',
+    'similarity': 'item_similarity',
+    'tfidf': 'tfidf_index',
+}
+
+def build(target):
+    # Importing the service fits its models; RECOMMENDER_REFIT makes sure it
+    # doesn't just load the previous snapshot
+    os.environ['RECOMMENDER_REFIT'] = '1'
+    module = importlib.import_module(TARGETS[target])
+    return module.save_artifacts()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fit recommender models and publish a model snapshot.')
+    parser.add_argument('targets', nargs='*', help=f"what to build: {', '.join(TARGETS)} (default: all)")
+    args = parser.parse_args(argv)
+    for target in args.targets:
+        if target not in TARGETS:
+            parser.error(f"unknown target '{target}'")
+
+    # The services read their CSVs relative to server/, and app.py lives one level up
+    os.chdir(SERVER_DIR)
+    sys.path.insert(0, os.path.dirname(SERVER_DIR))
+
+    for target in args.targets or TARGETS:
+        path = build(target)
+        print(f"Published {target} snapshot: {path}")
+
+if __name__ == '__main__':
+    main()
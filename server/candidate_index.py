@@ -0,0 +1,110 @@
+import numpy as np
+import scipy.sparse as sp
+
+# Candidate retrieval over the product TF-IDF vectors.
+#
+# Every index answers search(query, k, allowed=None) with the row positions
+# and cosine scores of the k most similar products, best first. `allowed` is
+# an optional boolean mask over products (eligibility, already-interacted
+# exclusion) applied before ranking.
+#
+#   ExactIndex - brute-force cosine over the whole catalog, top-k with argpartition
+#   IVFIndex   - truncated SVD + inverted file: products are clustered in the
+#                reduced space and a query only re-ranks the members of the
+#                n_probe closest clusters. n_probe is the recall/latency knob;
+#                n_probe == n_lists is exact.
+#
+# sklearn is only imported to build an IVFIndex, so loading a snapshot and
+# searching an ExactIndex (or importing top_k) stays free of its ~1 s import.
+
+def top_k(indices, scores, k):
+    """The k best (indices, scores), best first. Ties keep their input order, like a stable sort of all scores."""
+    if k <= 0 or len(scores) == 0:
+        return indices[:0], scores[:0]
+    if k < len(scores):
+        # Everything scoring at least the k-th best score, so ties at the cut-off are decided by position
+        kth = np.partition(-scores, k - 1)[k - 1]
+        best = np.flatnonzero(-scores <= kth)
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best], kind='stable')][:k]
+    return indices[best], scores[best]
+
+def normalize_rows(matrix):
+    """Rows scaled to unit L2 norm (all-zero rows left as they are), like sklearn.preprocessing.normalize."""
+    matrix = sp.csr_matrix(matrix, dtype=np.float64)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sp.csr_matrix(sp.diags(1 / norms) @ matrix)
+
+class ExactIndex:
+    def __init__(self, matrix):
+        self.matrix = sp.csr_matrix(matrix)
+
+    def score(self, query, rows=None):
+        query = normalize_rows(query)
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return np.asarray((matrix @ query.T).todense()).ravel()
+
+    def search(self, query, k, allowed=None):
+        rows = np.arange(self.matrix.shape[0]) if allowed is None else np.flatnonzero(allowed)
+        return top_k(rows, self.score(query, None if allowed is None else rows), k)
+
+class IVFIndex(ExactIndex):
+    def __init__(self, matrix, n_lists=None, n_probe=None, n_components=64, random_state=42):
+        from sklearn.cluster import KMeans
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.preprocessing import normalize
+
+        super().__init__(matrix)
+        n_products, n_features = self.matrix.shape
+
+        self.n_lists = n_lists or max(1, int(np.sqrt(n_products)))
+        self.n_probe = n_probe or max(1, self.n_lists // 8)
+
+        self.svd = TruncatedSVD(n_components=max(1, min(n_components, n_features - 1, n_products - 1)), random_state=random_state)
+        reduced = normalize(self.svd.fit_transform(self.matrix))
+
+        kmeans = KMeans(n_clusters=self.n_lists, n_init=1, random_state=random_state).fit(reduced)
+        self.centroids = normalize(kmeans.cluster_centers_)
+
+        # Inverted lists as one array of members grouped by cluster plus offsets
+        self.list_members = np.argsort(kmeans.labels_, kind='stable')
+        self.list_offsets = np.searchsorted(kmeans.labels_[self.list_members], np.arange(self.n_lists + 1))
+
+    def search(self, query, k, allowed=None, n_probe=None):
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        if n_probe >= self.n_lists:
+            return super().search(query, k, allowed)
+
+        from sklearn.preprocessing import normalize
+
+        reduced_query = normalize(self.svd.transform(sp.csr_matrix(query)))
+        centroid_scores = (self.centroids @ reduced_query.T).ravel()
+        probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+        candidates = np.concatenate([
+            self.list_members[self.list_offsets[cluster]:self.list_offsets[cluster + 1]] for cluster in probed
+        ])
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+
+        # Not enough candidates in the probed lists: fall back to exact search
+        if len(candidates) < k:
+            return super().search(query, k, allowed)
+
+        candidates.sort()
+        return top_k(candidates, self.score(query, candidates), k)
+
+INDEX_TYPES = {
+    'exact': ExactIndex,
+    'ivf': IVFIndex,
+}
+
+# Below this many products brute force is already cheaper than probing lists
+MIN_APPROXIMATE_SIZE = 5000
+
+def build_candidate_index(matrix, method='auto', **params):
+    if method == 'auto':
+        method = 'ivf' if matrix.shape[0] >= MIN_APPROXIMATE_SIZE else 'exact'
+    return INDEX_TYPES[method](matrix, **params)
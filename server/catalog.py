@@ -0,0 +1,161 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+from model_artifacts import SnapshotWriter, load_current_snapshot, current_version
+
+# Typed, columnar product catalog.
+#
+# The scraper writes everything as text ("464", "3.7", "N/A", ...). Ingesting
+# a scraper CSV parses it once into typed columns and publishes them as a
+# model_artifacts snapshot named catalog-<csv name>:
+#
+#   numeric columns  <column>.values (int64 or float64) + <column>.null (bool)
+#   string columns   <column>.offsets (int64) + <column>.data (utf-8 bytes) + <column>.null
+#
+# Every array is a plain .npy, so loading memory-maps it without parsing or
+# copying. Recommenders use load_catalog(csv_path), which falls back to
+# parsing the CSV when there is no snapshot or the CSV changed since ingest.
+#
+#   python catalog.py                                  # the scraper CSVs used by the recommenders
+#   python catalog.py meesho_all_products_data.csv
+
+NUMERIC_COLUMNS = ['Price', 'Rating', 'Reviews']
+CATALOG_CSVS = ['meesho_all_products_data.csv', 'meesho_jewellery&black_kurti_data.csv']
+
+class Catalog:
+    def __init__(self, column_types, arrays):
+        """column_types: {column: 'int' | 'float' | 'string'}, in CSV order. arrays: the arrays described above."""
+        self.column_types = column_types
+        self.arrays = arrays
+        self.num_rows = len(arrays[f'{next(iter(column_types))}.null'])
+        self.version = None  # Set by load_catalog
+        self._strings = {}
+
+    @classmethod
+    def from_csv(cls, path):
+        # Default NA handling, so 'N/A' and empty fields are nulls like they were with read_csv
+        raw = pd.read_csv(path, dtype=str)
+        column_types = {}
+        arrays = {}
+        for column in raw.columns:
+            null = raw[column].isna().to_numpy().copy()
+            if column in NUMERIC_COLUMNS:
+                values = pd.to_numeric(raw[column], errors='coerce').to_numpy(dtype=float)
+                null |= np.isnan(values)
+                # Integral columns (prices, review counts) stay integers
+                if np.array_equal(values[~null], np.trunc(values[~null])):
+                    column_types[column] = 'int'
+                    values = np.where(null, 0, values).astype(np.int64)
+                else:
+                    column_types[column] = 'float'
+                arrays[f'{column}.values'] = values
+            else:
+                column_types[column] = 'string'
+                encoded = [value.encode('utf-8') if not missing else b'' for value, missing in zip(raw[column].tolist(), null)]
+                offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+                np.cumsum([len(value) for value in encoded], out=offsets[1:])
+                arrays[f'{column}.offsets'] = offsets
+                arrays[f'{column}.data'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            arrays[f'{column}.null'] = null
+        return cls(column_types, arrays)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        column_types = snapshot.json('catalog_columns')
+        arrays = {}
+        for column, column_type in column_types.items():
+            parts = ['values'] if column_type != 'string' else ['offsets', 'data']
+            for part in parts + ['null']:
+                arrays[f'{column}.{part}'] = snapshot.array(f'{column}.{part}')
+        return cls(column_types, arrays)
+
+    def save(self, writer):
+        for key, array in self.arrays.items():
+            writer.add_array(key, array)
+        writer.add_json('catalog_columns', self.column_types)
+
+    def __len__(self):
+        return self.num_rows
+
+    def numeric(self, column):
+        """(values, null mask) of a numeric column; values is float with NaN where null."""
+        values = self.arrays[f'{column}.values']
+        null = self.arrays[f'{column}.null']
+        return np.where(null, np.nan, values), null
+
+    def strings(self, column):
+        """All values of a string column as a list (None where null), decoded once and cached."""
+        if column not in self._strings:
+            offsets = self.arrays[f'{column}.offsets']
+            data = self.arrays[f'{column}.data'].tobytes()
+            null = self.arrays[f'{column}.null']
+            self._strings[column] = [
+                None if null[row] else data[offsets[row]:offsets[row + 1]].decode('utf-8')
+                for row in range(self.num_rows)
+            ]
+        return self._strings[column]
+
+    def records(self, rows, columns):
+        """Row dicts with plain Python values (None for nulls) for the given row positions."""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = {}
+        for column in columns:
+            if self.column_types[column] == 'string':
+                column_strings = self.strings(column)
+                values[column] = [column_strings[row] for row in rows.tolist()]
+            else:
+                null = self.arrays[f'{column}.null'][rows]
+                column_values = self.arrays[f'{column}.values'][rows].tolist()
+                values[column] = [None if missing else value for value, missing in zip(column_values, null.tolist())]
+        return [dict(zip(columns, row)) for row in zip(*(values[column] for column in columns))]
+
+def snapshot_name(csv_path):
+    return f'catalog-{os.path.splitext(os.path.basename(csv_path))[0]}'
+
+def source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def ingest(csv_path):
+    """Parse a scraper CSV and publish it as a typed catalog snapshot. Returns the snapshot path."""
+    catalog = Catalog.from_csv(csv_path)
+    writer = SnapshotWriter(snapshot_name(csv_path))
+    catalog.save(writer)
+    writer.add_json('source', source_signature(csv_path))
+    return writer.publish()
+
+def catalog_version(csv_path):
+    """Changes whenever the CSV or its CURRENT catalog snapshot changes; stamps cached results."""
+    signature = source_signature(csv_path)
+    return f"{current_version(snapshot_name(csv_path)) or 'csv'}:{signature['size']}:{signature['mtime_ns']}"
+
+def load_catalog(csv_path):
+    """Memory-mapped catalog for csv_path, or the CSV parsed in memory if it hasn't been ingested since it last changed."""
+    version = catalog_version(csv_path)
+    snapshot = load_current_snapshot(snapshot_name(csv_path))
+    catalog = None
+    if snapshot is not None:
+        if snapshot.json('source') == source_signature(csv_path):
+            catalog = Catalog.from_snapshot(snapshot)
+        else:
+            print(f"Catalog snapshot {snapshot.version} is older than {csv_path}, parsing the CSV", file=sys.stderr)
+    if catalog is None:
+        catalog = Catalog.from_csv(csv_path)
+    catalog.version = version
+    return catalog
+
+def save_artifacts():
+    return ', '.join(ingest(csv_path) for csv_path in CATALOG_CSVS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert scraper CSVs into typed, memory-mappable catalog snapshots.')
+    parser.add_argument('csvs', nargs='*', default=CATALOG_CSVS)
+    args = parser.parse_args(argv)
+    for csv_path in args.csvs:
+        print(f"Ingested {csv_path}: {ingest(csv_path)}")
+
+if __name__ == '__main__':
+    main()
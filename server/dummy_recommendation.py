@@ -1,63 +1,98 @@
 import sys
 import json
+import time
 import pandas as pd
 import numpy as np
 
-# Load Product Data
-product_data = pd.read_csv('meesho_jewellery&black_kurti_data.csv')
+from catalog import load_catalog, catalog_version
+from result_cache import ResultCache
 
-def calculate_score(row):
-    try:
-        rating = float(row['Rating']) if row['Rating'] != 'N/A' else 0
-        reviews = int(row['Reviews']) if row['Reviews'] != 'N/A' else 0
-        return rating * np.log1p(reviews)
-    except:
-        return 0
-
-def is_product_for_gender(title, query, gender):
-    title_lower = title.lower()
-    query_lower = query.lower()
+# Load Product Data (typed columns, memory-mapped once ingested with catalog.py)
+CATALOG_CSV = 'meesho_jewellery&black_kurti_data.csv'
+catalog = load_catalog(CATALOG_CSV)
+
+OUTPUT_COLUMNS = ['Title', 'Price', 'Rating', 'Reviews', 'Image URL', 'Product URL']
+
+def calculate_scores(catalog):
+    # rating * log1p(reviews) on the typed columns: a missing rating
+    # propagates as NaN (ranked last), a missing review count scores 0
+    rating, _ = catalog.numeric('Rating')
+    reviews, reviews_null = catalog.numeric('Reviews')
+    scores = rating * np.log1p(np.trunc(reviews))
+    scores[reviews_null] = 0.0
+    return scores
+
+def gender_mask(catalog, gender):
+    title_lower = pd.Series(catalog.strings('Title')).fillna('').str.lower()
+    query_lower = pd.Series(catalog.strings('Query')).fillna('').str.lower()
+    has_men = title_lower.str.contains('men', regex=False) | query_lower.str.contains('men', regex=False)
+    has_women = title_lower.str.contains('women', regex=False) | query_lower.str.contains('women', regex=False)
     if gender == 'male':
-        return ('men' in title_lower or 'men' in query_lower) and not ('women' in title_lower or 'women' in query_lower)
+        return (has_men & ~has_women).to_numpy()
     elif gender == 'female':
-        return ('women' in title_lower or 'women' in query_lower) and not ('men' in title_lower or 'men' in query_lower)
-    return True  # If gender is unspecified, consider all products
+        return (has_women & ~has_men).to_numpy()
+    return np.ones(len(catalog), dtype=bool)  # If gender is unspecified, consider all products
 
-def recommend_initial(user_info, page=0, items_per_page=20):
-    user_gender = user_info['gender'].lower()
+def build_ranked_index(catalog):
+    """Rank the catalog once per gender so a page request is just a list slice."""
+    scores = pd.Series(calculate_scores(catalog))
 
-    # Apply gender filter and calculate scores
-    eligible_products = product_data[product_data.apply(lambda row: is_product_for_gender(row['Title'], row['Query'], user_gender), axis=1)].copy()
-    
-    # If no products match the gender, return all products (fallback)
-    if eligible_products.empty:
-        eligible_products = product_data.copy()
-    
-    # Calculate score based on rating and reviews
-    eligible_products['score'] = eligible_products.apply(calculate_score, axis=1)
+    ranked_index = {}
+    for gender in ['male', 'female', None]:
+        mask = gender_mask(catalog, gender)
 
-    # Sort products by score and select recommendations for the current page
-    ranked_products = eligible_products.sort_values('score', ascending=False)
-    start = page * items_per_page
-    end = start + items_per_page
-    recommendations = ranked_products.iloc[start:end]
+        # If no products match the gender, return all products (fallback)
+        eligible_scores = scores[mask] if mask.any() else scores
 
-    # Prepare the output
-    output = recommendations[['Title', 'Price', 'Rating', 'Reviews', 'Image URL', 'Product URL']].to_dict('records')
+        ranked_rows = eligible_scores.sort_values(ascending=False).index
+        ranked_index[gender] = catalog.records(ranked_rows, OUTPUT_COLUMNS)
 
-    return output
+    return ranked_index
 
-if __name__ == '__main__':
-    email, name, age, gender, city, page = sys.argv[1:]
-    
+ranked_index = build_ranked_index(catalog)
+
+# Pages only depend on (gender, page) and the catalog, so they are shared across users
+result_cache = ResultCache()
+
+CATALOG_CHECK_INTERVAL = 10  # seconds between checks for a re-ingested catalog
+catalog_checked_at = time.monotonic()
+
+def refresh_catalog():
+    """Reload the catalog and drop cached pages if it was rebuilt since it was loaded."""
+    global catalog, ranked_index, catalog_checked_at
+    if time.monotonic() - catalog_checked_at < CATALOG_CHECK_INTERVAL:
+        return
+    catalog_checked_at = time.monotonic()
+    if catalog_version(CATALOG_CSV) != catalog.version:
+        catalog = load_catalog(CATALOG_CSV)
+        ranked_index = build_ranked_index(catalog)
+        result_cache.invalidate()
+
+def recommend_initial(user_info, page=0, items_per_page=20):
+    refresh_catalog()
+    user_gender = user_info['gender'].lower()
+    if user_gender not in ranked_index:
+        user_gender = None
+
+    def compute_page():
+        start = page * items_per_page
+        end = start + items_per_page
+        return ranked_index[user_gender][start:end]
+
+    key = (catalog.version, user_gender, page, items_per_page)
+    return [dict(product) for product in result_cache.get_or_compute(key, compute_page)]
+
+def parse_request(email, name, age, gender, city, page):
     # Handle potential invalid inputs
     try:
         age = int(age)
-    except ValueError:
+    except (TypeError, ValueError):
         age = 0  # Default age if invalid
 
+    gender = str(gender)
     gender = gender.lower() if gender.lower() in ['male', 'female'] else 'female'
-    
+
+    page = str(page)
     page = int(page) if page.isdigit() else 0
 
     user_info = {
@@ -67,6 +102,10 @@ if __name__ == '__main__':
         'gender': gender,
         'location': city
     }
+    return user_info, page
+
+if __name__ == '__main__':
+    user_info, page = parse_request(*sys.argv[1:])
 
     recommendations = recommend_initial(user_info, page)
     print(json.dumps(recommendations))
\ No newline at end of file
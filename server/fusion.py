@@ -0,0 +1,69 @@
+import numpy as np
+
+# Rank fusion for hybrid recommendations.
+#
+# Each source (demographic, content, collaborative, ...) hands in a ranked
+# array of catalog row positions. Every occurrence contributes a score that
+# depends on the source weight and the rank, contributions are combined per
+# product, and the fused ranking is returned as row positions. Ties keep the
+# order in which products were first seen across the sources.
+#
+# Strategies:
+#   weighted_sum    - sum of the weights of the sources that returned the product
+#   reciprocal_rank - sum of weight / (k + rank + 1)  (RRF)
+#   max_score       - best weight * (1 - rank / len(source)) over the sources
+
+def weighted_sum(weight, ranks, length, k):
+    return np.full(len(ranks), float(weight))
+
+def reciprocal_rank(weight, ranks, length, k):
+    return weight / (k + ranks + 1.0)
+
+def max_score(weight, ranks, length, k):
+    return weight * (1.0 - ranks / max(length, 1))
+
+STRATEGIES = {
+    'weighted_sum': (weighted_sum, np.add),
+    'reciprocal_rank': (reciprocal_rank, np.add),
+    'max_score': (max_score, np.maximum),
+}
+
+class Fusion:
+    def __init__(self, weights, strategy='weighted_sum', rrf_k=60):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown fusion strategy '{strategy}', expected one of {sorted(STRATEGIES)}")
+        self.weights = dict(weights)
+        self.strategy = strategy
+        self.rrf_k = rrf_k
+        self.contribution, self.combine = STRATEGIES[strategy]
+
+    def fuse(self, ranked_lists, num_recommendations, exclude=None):
+        """ranked_lists: {source: array of row positions, best first}. exclude: optional boolean mask over the catalog."""
+        items = []
+        contributions = []
+        for source, ranked in ranked_lists.items():
+            ranked = np.asarray(ranked, dtype=np.int64)
+            if len(ranked) == 0:
+                continue
+            # A product counts once per source, at its best rank
+            _, first = np.unique(ranked, return_index=True)
+            ranked = ranked[np.sort(first)]
+            items.append(ranked)
+            contributions.append(self.contribution(self.weights[source], np.arange(len(ranked)), len(ranked), self.rrf_k))
+
+        if not items:
+            return np.array([], dtype=np.int64)
+        items = np.concatenate(items)
+        contributions = np.concatenate(contributions)
+
+        if exclude is not None:
+            keep = ~exclude[items]
+            items = items[keep]
+            contributions = contributions[keep]
+
+        unique, first_seen, inverse = np.unique(items, return_index=True, return_inverse=True)
+        scores = np.zeros(len(unique)) if self.combine is np.add else np.full(len(unique), -np.inf)
+        self.combine.at(scores, inverse, contributions)
+
+        order = np.lexsort((first_seen, -scores))
+        return unique[order][:num_recommendations]
@@ -0,0 +1,173 @@
+import os
+import sys
+import time
+import bisect
+import threading
+import functools
+from collections import Counter
+
+# Hot-path latency instrumentation.
+#
+# Stages of the recommendation pipeline are wrapped in named spans:
+#
+#   with span('recommend_updated.content'):
+#       ...
+#
+#   @timed('hybrid_recommendation')
+#   def hybrid_recommendation(...):
+#
+# Each span's duration goes into an in-process histogram per stage, and
+# metrics_text() renders all of them in the Prometheus text format
+# (register_endpoints adds /metrics to a Flask app). With
+# RECOMMENDER_INSTRUMENTATION=0, span() hands back one shared no-op context
+# manager and timed() returns the function undecorated, so disabled spans
+# cost a function call.
+#
+# RECOMMENDER_PROFILE_HZ=<rate> also starts a sampling profiler: a daemon
+# thread snapshots every thread's stack rate times a second and counts
+# collapsed stacks, served at /profile in the format flamegraph.pl reads.
+
+ENABLED = os.environ.get('RECOMMENDER_INSTRUMENTATION', '1') != '0'
+PROFILE_HZ = float(os.environ.get('RECOMMENDER_PROFILE_HZ', 0))
+
+METRIC_NAME = 'recommender_stage_duration_seconds'
+
+# Upper bounds in seconds, 0.1 ms to 10 s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}  # stage -> Histogram
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def text(self):
+        lines = [
+            f'# HELP {METRIC_NAME} Time spent in each recommendation pipeline stage.',
+            f'# TYPE {METRIC_NAME} histogram',
+        ]
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+class Span:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        registry.observe(self.stage, time.perf_counter() - self.start)
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+NULL_SPAN = NullSpan()
+
+def span(stage):
+    return Span(stage) if ENABLED else NULL_SPAN
+
+def timed(stage):
+    """Decorator: time every call of the function as stage."""
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with Span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def metrics_text():
+    return registry.text()
+
+# Sampling profiler
+
+class SamplingProfiler:
+    def __init__(self, hz):
+        self.interval = 1.0 / hz
+        self.samples = Counter()  # 'outer;...;inner' -> samples
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                with self.lock:
+                    self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Collapsed stacks, one 'frame;frame;... count' line each, most sampled first."""
+        with self.lock:
+            return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+profiler = SamplingProfiler(PROFILE_HZ).start() if PROFILE_HZ > 0 else None
+
+def register_endpoints(app):
+    """Add /metrics (and /profile when the sampling profiler is on) to a Flask app."""
+    from flask import Response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(metrics_text(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/profile')
+    def profile():
+        if profiler is None:
+            return Response('Sampling profiler is off; set RECOMMENDER_PROFILE_HZ to enable it\n', status=404, mimetype='text/plain')
+        return Response(profiler.collapsed(), mimetype='text/plain')
@@ -0,0 +1,184 @@
+import os
+import csv
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Live interaction events on top of the interactions loaded at start-up.
+#
+# ingest() applies one (user_id, product_id, interaction_type, timestamp)
+# event in O(1) with respect to the catalog and the interaction history: it
+# adds the event to the segment's popularity.PopularityEngine scores and the
+# product's non-zero TF-IDF weights to the user's profile sum. Readers get
+# consistent per-request views (user_view, top_products) under the same lock.
+# compact() appends the buffered events to the interactions CSV and folds them
+# into the base InteractionMatrix; start_compaction() runs it periodically.
+#
+# Events are validated by parse_event() before they touch any state, and
+# their timestamps are written as naive ISO 8601 seconds
+# (2024-09-18T10:15:00), which PopularityEngine.add_interactions parses
+# together with the CSV's plain dates.
+#
+# The segment an event was counted under is written with it, so users that
+# were only segmented after start-up (ingest's segment argument) keep their
+# popularity across restarts: merge_segments() falls back to it for users the
+# services don't segment themselves. The column is added to older CSVs on the
+# first compaction.
+
+EVENT_FIELDS = ['user_id', 'product_id', 'interaction_type', 'timestamp', 'segment']
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+def parse_id(value, name):
+    if isinstance(value, bool):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+    if isinstance(value, float) and value != parsed:
+        raise ValueError(f"{name} must be an integer")
+    return parsed
+
+def parse_timestamp(timestamp):
+    """Canonical event timestamp string; None means now. Timezone-aware times are converted to UTC."""
+    if timestamp is None:
+        return datetime.now().strftime(TIMESTAMP_FORMAT)
+    if not isinstance(timestamp, str):
+        raise ValueError("timestamp must be an ISO 8601 string")
+    try:
+        parsed = pd.Timestamp(timestamp)
+    except ValueError:
+        raise ValueError(f"timestamp {timestamp!r} is not ISO 8601") from None
+    if pd.isna(parsed):
+        raise ValueError(f"timestamp {timestamp!r} is not ISO 8601")
+    if parsed.tzinfo is not None:
+        parsed = parsed.tz_convert('UTC').tz_localize(None)
+    return parsed.strftime(TIMESTAMP_FORMAT)
+
+def merge_segments(interactions, users):
+    """interactions with each user's segment from users (user_id, segment), or else the segment stored with the event."""
+    interactions = interactions.rename(columns={'segment': 'event_segment'})
+    interactions = interactions.merge(users[['user_id', 'segment']], on='user_id', how='left')
+    if 'event_segment' in interactions:
+        interactions['segment'] = interactions['segment'].fillna(interactions.pop('event_segment'))
+    return interactions
+
+def add_segment_column(path):
+    """Rewrite an interactions CSV from before events carried their segment with an empty segment column."""
+    with open(path, newline='') as f:
+        header = next(csv.reader(f), None)
+    if header is None or 'segment' in header:
+        return
+    interactions = pd.read_csv(path, dtype=str, keep_default_na=False)
+    interactions['segment'] = ''
+    interactions.to_csv(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+def parse_event(user_id, product_id, interaction_type, timestamp=None):
+    """(user_id, product_id, interaction_type, timestamp) as stored, or ValueError if the event is malformed."""
+    if not isinstance(interaction_type, str) or not interaction_type:
+        raise ValueError("interaction_type must be a non-empty string")
+    return parse_id(user_id, 'user_id'), parse_id(product_id, 'product_id'), interaction_type, parse_timestamp(timestamp)
+
+class InteractionStream:
+    def __init__(self, interaction_matrix, tfidf_matrix, user_segments, popularity, path=None):
+        """interaction_matrix: compacted interactions (user_profiles.InteractionMatrix).
+        user_segments: {user_id: segment}. popularity: PopularityEngine already fed the compacted interactions.
+        path: interactions CSV that compact() appends to (None keeps events in memory only)."""
+        self.base = interaction_matrix
+        self.tfidf_matrix = tfidf_matrix.tocsr()
+        self.user_segments = {user_id: int(segment) for user_id, segment in user_segments.items()}
+        self.popularity = popularity
+        self.path = path
+
+        # Users with events since the last compaction: catalog rows and TF-IDF sum
+        self.user_products = {}
+        self.profile_sums = {}
+        self.pending = []
+
+        self.lock = threading.RLock()
+        self.compaction_timer = None
+
+    def ingest(self, user_id, product_id, interaction_type, timestamp=None, segment=None):
+        """Apply one interaction event. segment is only needed for users that weren't segmented at start-up.
+        Raises ValueError, without recording anything, if the event is malformed (see parse_event)."""
+        event = parse_event(user_id, product_id, interaction_type, timestamp)
+        user_id, product_id, interaction_type, timestamp = event
+        row = self.base.product_rows.get(product_id)
+
+        with self.lock:
+            if segment is not None:
+                self.user_segments[user_id] = int(segment)
+            segment = self.user_segments.get(user_id)
+            if segment is not None:
+                self.popularity.add(segment, product_id, interaction_type, timestamp)
+            # Only once it has been applied, so a failing event never reaches the CSV
+            self.pending.append(event + (segment,))
+
+            if row is None:
+                return  # Not in the catalog, so it can't be part of a profile
+
+            products = self.user_products.get(user_id)
+            if products is None:
+                # First event since the last compaction: start from the compacted history
+                products = set(self.base.interacted_products(user_id).tolist())
+                self.profile_sums[user_id] = np.asarray(self.tfidf_matrix[sorted(products)].sum(axis=0)).ravel()
+                self.user_products[user_id] = products
+
+            if row not in products:
+                products.add(row)
+                start, end = self.tfidf_matrix.indptr[row], self.tfidf_matrix.indptr[row + 1]
+                self.profile_sums[user_id][self.tfidf_matrix.indices[start:end]] += self.tfidf_matrix.data[start:end]
+
+    def user_view(self, user_id):
+        """(interacted catalog rows, 1 x features mean TF-IDF profile) as of now; the profile is None without interactions."""
+        with self.lock:
+            products = self.user_products.get(user_id)
+            if products is None:
+                rows = self.base.interacted_products(user_id)
+                profile = self.base.profile(user_id, self.tfidf_matrix) if len(rows) else None
+                return rows, profile
+            rows = np.array(sorted(products), dtype=np.int64)
+            return rows, (self.profile_sums[user_id] / len(rows))[None, :]
+
+    def top_products(self, segment):
+        """(product ids popular in the segment, best first; version of that list)."""
+        with self.lock:
+            product_ids, version = self.popularity.top(int(segment))
+        return np.array(product_ids), version
+
+    def compact(self):
+        """Write buffered events to disk and fold them into the base interaction matrix. Returns the number of events."""
+        with self.lock:
+            events = self.pending
+            if not events:
+                return 0
+            if self.path:
+                new_file = not os.path.exists(self.path)
+                if not new_file:
+                    add_segment_column(self.path)
+                with open(self.path, 'a', newline='') as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(EVENT_FIELDS)
+                    writer.writerows(events)
+            self.base = self.base.merged([event[0] for event in events], [event[1] for event in events])
+            self.pending = []
+            self.user_products = {}
+            self.profile_sums = {}
+            return len(events)
+
+    def start_compaction(self, interval=60):
+        """Compact every interval seconds on a daemon thread until stop_compaction()."""
+        def run():
+            self.compact()
+            self.start_compaction(interval)
+        self.compaction_timer = threading.Timer(interval, run)
+        self.compaction_timer.daemon = True
+        self.compaction_timer.start()
+
+    def stop_compaction(self):
+        if self.compaction_timer is not None:
+            self.compaction_timer.cancel()
+        self.compact()
@@ -0,0 +1,118 @@
+import argparse
+import numpy as np
+import scipy.sparse as sp
+
+from candidate_index import top_k
+from model_artifacts import SnapshotWriter, add_catalog
+
+# Precomputed item-item content similarity.
+#
+# For every product, the k most similar products by TF-IDF cosine, computed
+# offline block by block (block_size products x catalog sparse products, so
+# memory is bounded by one block of scores) and stored as CSR arrays: the
+# neighbours of catalog row r are indices[indptr[r]:indptr[r + 1]], best
+# first, with their cosine in scores. Looking up similar products is a slice.
+#
+# candidates() ranks products for a user by the summed similarity to the
+# user's interacted products. The mean-TF-IDF profile scores a product by the
+# mean of its cosines to those products, so this is the same ranking the
+# brute-force profile search gives, truncated to each product's k neighbours.
+#
+#   python build_artifacts.py similarity      # or: python item_similarity.py -k 50
+
+ARTIFACTS_NAME = 'item-similarity'
+DEFAULT_NEIGHBOURS = 20
+DEFAULT_BLOCK_SIZE = 1024
+
+def top_neighbours(matrix, rows, k):
+    """(neighbour rows, cosine scores) of the given rows against the whole (L2-normalized) matrix, best first."""
+    similarities = (matrix[rows] @ matrix.T).tocsr()
+    for offset, row in enumerate(rows.tolist()):
+        start, end = similarities.indptr[offset], similarities.indptr[offset + 1]
+        neighbours, scores = similarities.indices[start:end], similarities.data[start:end]
+        not_self = neighbours != row
+        yield top_k(neighbours[not_self], scores[not_self], k)
+
+class ItemSimilarity:
+    def __init__(self, indptr, indices, scores):
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+
+    @classmethod
+    def build(cls, tfidf_matrix, k=DEFAULT_NEIGHBOURS, block_size=DEFAULT_BLOCK_SIZE):
+        from sklearn.preprocessing import normalize
+
+        matrix = normalize(sp.csr_matrix(tfidf_matrix))
+        num_products = matrix.shape[0]
+        indptr = np.zeros(num_products + 1, dtype=np.int64)
+        indices = []
+        scores = []
+        for start in range(0, num_products, block_size):
+            rows = np.arange(start, min(start + block_size, num_products))
+            for row, (neighbours, neighbour_scores) in zip(rows.tolist(), top_neighbours(matrix, rows, k)):
+                indptr[row + 1] = indptr[row] + len(neighbours)
+                indices.append(neighbours.astype(np.int32))
+                scores.append(neighbour_scores.astype(np.float32))
+        return cls(
+            indptr,
+            np.concatenate(indices) if indices else np.array([], dtype=np.int32),
+            np.concatenate(scores) if scores else np.array([], dtype=np.float32),
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(*(snapshot.array(f'item_similarity.{part}') for part in ('indptr', 'indices', 'scores')))
+
+    def save(self, writer):
+        writer.add_array('item_similarity.indptr', self.indptr)
+        writer.add_array('item_similarity.indices', self.indices)
+        writer.add_array('item_similarity.scores', self.scores)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def similar(self, row, k=None):
+        """(neighbour rows, cosine scores) of catalog row, best first; at most k (default: all stored)."""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        if k is not None:
+            end = min(end, start + k)
+        return np.asarray(self.indices[start:end]), np.asarray(self.scores[start:end])
+
+    def candidates(self, rows, k, allowed=None):
+        """Top-k products by summed similarity to the given rows (a user's interacted products), best first.
+        allowed: optional boolean mask over products, applied before ranking."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=float)
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        positions = np.concatenate([np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist())])
+        neighbours = np.asarray(self.indices[positions], dtype=np.int64)
+        totals = np.bincount(neighbours, weights=self.scores[positions], minlength=len(self))
+
+        candidates = np.unique(neighbours)
+        candidates = candidates[~np.isin(candidates, rows)]
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        return top_k(candidates, totals[candidates], k)
+
+def save_artifacts(k=DEFAULT_NEIGHBOURS, block_size=DEFAULT_BLOCK_SIZE):
+    """Compute the table for recommendation_handler's TF-IDF matrix and publish it. Returns the snapshot path."""
+    import recommendation_handler as handler
+
+    similarity = ItemSimilarity.build(handler.tfidf_matrix, k, block_size)
+    writer = SnapshotWriter(ARTIFACTS_NAME)
+    add_catalog(writer, handler.product_data['product_id'], handler.product_data['combined_features'])
+    writer.add_json('item_similarity', {'k': k})
+    similarity.save(writer)
+    return writer.publish()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute the top-k most similar products of every product.')
+    parser.add_argument('-k', '--neighbours', type=int, default=DEFAULT_NEIGHBOURS)
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE, help='products per sparse product')
+    args = parser.parse_args(argv)
+    print(f"Published item similarity snapshot: {save_artifacts(args.neighbours, args.block_size)}")
+
+if __name__ == '__main__':
+    main()
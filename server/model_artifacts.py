@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Versioned model snapshots.
+#
+# build_artifacts.py fits the models once and writes them under
+# artifacts/<name>/<version>/ (dense arrays as .npy, sparse matrices as their
+# CSR data/indices/indptr .npy files, small metadata as JSON), then points
+# artifacts/<name>/CURRENT at the new version. Services load CURRENT at
+# start-up instead of refitting; .npy arrays are memory-mapped so several
+# workers share one copy of the model. Publishing prunes all but the
+# KEEP_VERSIONS newest versions older than CURRENT (RECOMMENDER_KEEP_VERSIONS).
+
+ARTIFACTS_ROOT = os.environ.get('RECOMMENDER_ARTIFACTS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'artifacts'))
+SNAPSHOT_FORMAT = 1
+KEEP_VERSIONS = int(os.environ.get('RECOMMENDER_KEEP_VERSIONS', 3))
+
+class SnapshotWriter:
+    def __init__(self, name, root=ARTIFACTS_ROOT):
+        self.name = name
+        self.root = root
+        self.version = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        self.path = os.path.join(root, name, self.version)
+        self.manifest = {'name': name, 'version': self.version, 'format': SNAPSHOT_FORMAT, 'files': {}}
+        os.makedirs(self.path)
+
+    def add_array(self, key, array):
+        np.save(os.path.join(self.path, f'{key}.npy'), np.asarray(array))
+        self.manifest['files'][key] = 'array'
+
+    def add_sparse(self, key, matrix):
+        import scipy.sparse as sp
+
+        # CSR components as plain .npy so they memory-map like everything else
+        matrix = sp.csr_matrix(matrix)
+        for part in ('data', 'indices', 'indptr'):
+            np.save(os.path.join(self.path, f'{key}.{part}.npy'), getattr(matrix, part))
+        self.add_json(f'{key}.shape', list(matrix.shape))
+        self.manifest['files'][key] = 'sparse'
+
+    def add_json(self, key, value):
+        with open(os.path.join(self.path, f'{key}.json'), 'w') as f:
+            json.dump(value, f)
+        self.manifest['files'][key] = 'json'
+
+    def add_frame(self, key, frame):
+        # One .npy per column keeps numeric columns memory-mappable
+        for column in frame.columns:
+            self.add_array(f'{key}.{column}', frame[column].to_numpy())
+        self.add_json(key, list(frame.columns))
+        self.manifest['files'][key] = 'frame'
+
+    def publish(self):
+        with open(os.path.join(self.path, 'manifest.json'), 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+        # Switch CURRENT atomically so running services never see a half-written snapshot
+        current = os.path.join(self.root, self.name, 'CURRENT')
+        with open(current + '.tmp', 'w') as f:
+            f.write(self.version)
+        os.replace(current + '.tmp', current)
+        prune_versions(self.name, self.root)
+        return self.path
+
+class Snapshot:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest['version']
+
+    def array(self, key):
+        return np.load(os.path.join(self.path, f'{key}.npy'), mmap_mode='r', allow_pickle=False)
+
+    def sparse(self, key):
+        import scipy.sparse as sp
+
+        if os.path.exists(os.path.join(self.path, f'{key}.npz')):
+            return sp.load_npz(os.path.join(self.path, f'{key}.npz')).tocsr()  # Snapshots written before CSR parts
+        parts = [self.array(f'{key}.{part}') for part in ('data', 'indices', 'indptr')]
+        return sp.csr_matrix(tuple(parts), shape=tuple(self.json(f'{key}.shape')), copy=False)
+
+    def json(self, key):
+        with open(os.path.join(self.path, f'{key}.json')) as f:
+            return json.load(f)
+
+    def frame(self, key):
+        return pd.DataFrame({column: np.asarray(self.array(f'{key}.{column}')) for column in self.json(key)})
+
+def current_version(name, root=ARTIFACTS_ROOT):
+    """Version CURRENT points at for name, or None. Cheap enough to poll for rebuilds."""
+    try:
+        with open(os.path.join(root, name, 'CURRENT')) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def prune_versions(name, root=ARTIFACTS_ROOT, keep=KEEP_VERSIONS):
+    """Delete all but the keep newest versions older than CURRENT; returns the deleted versions.
+    Newer versions are left alone, another writer may still be filling them in."""
+    current = current_version(name, root)
+    if current is None:
+        return []
+    directory = os.path.join(root, name)
+    older = sorted(entry for entry in os.listdir(directory) if entry < current and os.path.isdir(os.path.join(directory, entry)))
+    removed = older[:max(0, len(older) - keep)]
+    for version in removed:
+        # Services still holding memory-mapped files from it keep reading the unlinked data
+        shutil.rmtree(os.path.join(directory, version), ignore_errors=True)
+    return removed
+
+def load_current_snapshot(name, root=ARTIFACTS_ROOT):
+    """Return the CURRENT snapshot for name, or None if there is none (or RECOMMENDER_REFIT is set)."""
+    if os.environ.get('RECOMMENDER_REFIT'):
+        return None
+    version = current_version(name, root)
+    if version is None:
+        return None
+    try:
+        snapshot = Snapshot(os.path.join(root, name, version))
+    except FileNotFoundError:
+        return None
+    if snapshot.manifest.get('format') != SNAPSHOT_FORMAT:
+        print(f"Ignoring {name} snapshot {version}: unsupported format", file=sys.stderr)
+        return None
+    return snapshot
+
+def check_can_fit(name):
+    """Call before fitting a model that has no usable snapshot. Processes started with RECOMMENDER_NO_FIT
+    (pipeline.py workers) must only load snapshots: several of them fitting and publishing at once race."""
+    if os.environ.get('RECOMMENDER_NO_FIT'):
+        raise RuntimeError(f"No usable {name} snapshot and RECOMMENDER_NO_FIT is set; run build_artifacts.py first")
+
+def catalog_hash(product_texts):
+    """Digest of the product texts the content models were built from (order included)."""
+    hashes = pd.util.hash_pandas_object(pd.Series(product_texts).fillna('').astype(str), index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
+
+def add_catalog(writer, product_ids, product_texts):
+    """Record which catalog a snapshot was built for; see snapshot_matches_catalog."""
+    writer.add_array('product_ids', np.asarray(product_ids))
+    writer.add_json('catalog_hash', catalog_hash(product_texts))
+
+def snapshot_matches_catalog(snapshot, product_ids, product_texts):
+    # tfidf_matrix rows are positional, so a snapshot's catalog models are only usable for the same
+    # catalog order, and only while the texts (details, derived attributes) they were vectorized
+    # from are unchanged. The KMeans centroids don't depend on the catalog; callers keep those.
+    if snapshot is None:
+        return False
+    if not np.array_equal(snapshot.array('product_ids'), np.asarray(product_ids)):
+        print(f"Snapshot {snapshot.version} was built for a different catalog, not using its catalog models", file=sys.stderr)
+        return False
+    stored_hash = snapshot.json('catalog_hash') if 'catalog_hash' in snapshot.manifest['files'] else None
+    if stored_hash != catalog_hash(product_texts):
+        print(f"Snapshot {snapshot.version} was built from different product texts, not using its catalog models", file=sys.stderr)
+        return False
+    return True
+
+# KMeans
+
+class CentroidSegmenter:
+    """Nearest-centroid predict() over fitted KMeans centroids, without refitting."""
+    def __init__(self, cluster_centers):
+        self.cluster_centers_ = cluster_centers
+        self.n_clusters = len(cluster_centers)
+
+    def predict(self, features):
+        features = np.asarray(features, dtype=float)
+        distances = (
+            (features ** 2).sum(axis=1)[:, None]
+            - 2 * features @ self.cluster_centers_.T
+            + (self.cluster_centers_ ** 2).sum(axis=1)[None, :]
+        )
+        return distances.argmin(axis=1).astype(np.int32)
+
+def save_kmeans(writer, kmeans, feature_columns):
+    writer.add_array('kmeans_centroids', kmeans.cluster_centers_)
+    writer.add_json('kmeans_features', list(feature_columns))
+
+def load_kmeans(snapshot):
+    return CentroidSegmenter(snapshot.array('kmeans_centroids')), snapshot.json('kmeans_features')
+
+# TF-IDF
+
+def save_tfidf(writer, tfidf, tfidf_matrix):
+    writer.add_json('tfidf_vocabulary', {term: int(index) for term, index in tfidf.vocabulary_.items()})
+    writer.add_array('tfidf_idf', tfidf.idf_)
+    writer.add_sparse('tfidf_matrix', tfidf_matrix)
+
+def load_tfidf_matrix(snapshot):
+    return snapshot.sparse('tfidf_matrix')
+
+def load_tfidf_vectorizer(snapshot, **vectorizer_params):
+    # Only needed to transform new texts or save a snapshot; importing sklearn takes about a second
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    tfidf = TfidfVectorizer(vocabulary=snapshot.json('tfidf_vocabulary'), **vectorizer_params)
+    tfidf.idf_ = np.asarray(snapshot.array('tfidf_idf'))
+    return tfidf
+
+# Surprise SVD
+
+def save_svd(writer, algo):
+    trainset = algo.trainset
+    writer.add_array('svd_pu', algo.pu)
+    writer.add_array('svd_qi', algo.qi)
+    writer.add_array('svd_bu', algo.bu)
+    writer.add_array('svd_bi', algo.bi)
+    writer.add_array('svd_users', [trainset.to_raw_uid(inner) for inner in trainset.all_users()])
+    writer.add_array('svd_items', [trainset.to_raw_iid(inner) for inner in trainset.all_items()])
+
+def load_svd(snapshot, trainset):
+    """Rebuild a fitted surprise SVD from its factors. trainset must be built from the same ratings."""
+    from surprise import SVD
+
+    users = [trainset.to_raw_uid(inner) for inner in trainset.all_users()]
+    items = [trainset.to_raw_iid(inner) for inner in trainset.all_items()]
+    if not (np.array_equal(snapshot.array('svd_users'), users) and np.array_equal(snapshot.array('svd_items'), items)):
+        return None
+
+    algo = SVD()
+    algo.trainset = trainset
+    algo.pu = snapshot.array('svd_pu')
+    algo.qi = snapshot.array('svd_qi')
+    algo.bu = snapshot.array('svd_bu')
+    algo.bi = snapshot.array('svd_bi')
+    return algo
@@ -0,0 +1,162 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import importlib
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+from model_artifacts import ARTIFACTS_ROOT
+
+# Sharded batch jobs on a process pool.
+#
+# The parent splits the work (users or catalog rows) into shards and hands
+# each one to a ProcessPoolExecutor worker. Workers don't get the models in
+# their task arguments: they import recommendation_handler once, which
+# memory-maps the TF-IDF matrix, centroids and product ids from the CURRENT
+# recommender snapshot, so every worker reads the same pages of the same
+# .npy files. The parent first makes sure that snapshot matches the catalog,
+# rebuilding it once if not, and the workers run with RECOMMENDER_NO_FIT so
+# none of them fits or publishes models of its own. Each worker writes its shard to a JSON-lines part file and the
+# parent concatenates the parts in shard order, so the output is identical to
+# a single-process run.
+#
+#   python pipeline.py users existing_user_data.csv -o recommendations.jsonl --workers 8
+#   python pipeline.py products -o similar_products.jsonl --workers 8
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def init_worker(artifacts_root):
+    # Same working directory and snapshot as the parent; one BLAS thread per
+    # process so the workers don't oversubscribe the cores between them
+    os.chdir(SERVER_DIR)
+    os.environ['RECOMMENDER_ARTIFACTS'] = artifacts_root
+    os.environ['RECOMMENDER_NO_FIT'] = '1'
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+def score_users(users, options, part_path):
+    from batch_recommendation import recommend_batch
+
+    count = 0
+    with open(part_path, 'w') as part:
+        for result in recommend_batch(users, options['num_recommendations'], options['chunk_size'], options['month']):
+            part.write(json.dumps(result) + '\n')
+            count += 1
+    return count
+
+def similar_products(rows, options, part_path):
+    """Top-k most similar catalog products (TF-IDF cosine) for each of the given catalog rows."""
+    import recommendation_handler as handler
+    from item_similarity import top_neighbours
+
+    product_ids = handler.product_data['product_id'].to_numpy()
+    chunk_size = options['chunk_size']
+
+    with open(part_path, 'w') as part:
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            for row, (neighbours, scores) in zip(chunk.tolist(), top_neighbours(handler.tfidf_matrix, chunk, options['num_recommendations'])):
+                part.write(json.dumps({
+                    'product_id': product_ids[row].item(),
+                    'similar': product_ids[neighbours].tolist(),
+                    'scores': np.round(scores, 6).tolist(),
+                }) + '\n')
+    return len(rows)
+
+JOBS = {
+    'users': score_users,
+    'products': similar_products,
+}
+
+def run_shard(job, shard, options, part_path):
+    return JOBS[job](shard, options, part_path)
+
+def user_shards(users_path, shard_size):
+    for shard in pd.read_csv(users_path, chunksize=shard_size):
+        yield shard.reset_index(drop=True)
+
+def product_shards(num_products, shard_size):
+    for start in range(0, num_products, shard_size):
+        yield np.arange(start, min(start + shard_size, num_products))
+
+def ensure_snapshot():
+    """The CURRENT recommender snapshot, rebuilt here once if it is missing or doesn't match the catalog;
+    otherwise every worker would fit (and publish) its own models."""
+    cwd = os.getcwd()
+    # recommendation_handler reads its CSVs relative to server/
+    os.chdir(SERVER_DIR)
+    try:
+        import recommendation_handler as handler
+
+        if handler.catalog_snapshot is None:
+            print("Recommender snapshot is missing or stale, rebuilding it", file=sys.stderr)
+            print(f"Published recommender snapshot: {handler.save_artifacts()}", file=sys.stderr)
+            # Forked workers inherit the module; load it again from the new snapshot
+            handler = importlib.reload(handler)
+        return handler.catalog_snapshot
+    finally:
+        os.chdir(cwd)
+
+def run(job, shards, output, workers=None, options=None):
+    """Run job over the shards on a process pool and write the merged results to output. Returns the number of results."""
+    workers = workers or os.cpu_count()
+    part_dir = tempfile.mkdtemp(prefix=f'pipeline-{job}-')
+    total = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(ARTIFACTS_ROOT,)) as pool:
+            # A few shards in flight per worker, so large inputs are never all queued in memory
+            pending = deque()
+            for index, shard in enumerate(shards):
+                part_path = os.path.join(part_dir, f'part-{index:05d}.jsonl')
+                pending.append((part_path, pool.submit(run_shard, job, shard, options, part_path)))
+                if len(pending) >= 2 * workers:
+                    total += merge_part(*pending.popleft(), output)
+            while pending:
+                total += merge_part(*pending.popleft(), output)
+        return total
+    finally:
+        shutil.rmtree(part_dir, ignore_errors=True)
+
+def merge_part(part_path, future, output):
+    # Parts are merged in shard order, so the output matches a single-process run
+    count = future.result()
+    with open(part_path) as part:
+        shutil.copyfileobj(part, output)
+    os.remove(part_path)
+    return count
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a batch job sharded across worker processes.')
+    parser.add_argument('job', choices=list(JOBS))
+    parser.add_argument('users', nargs='?', default='existing_user_data.csv', help='users CSV (users job)')
+    parser.add_argument('-o', '--output', required=True, help='merged JSON-lines output file')
+    parser.add_argument('-n', '--num-recommendations', type=int, default=5, help='recommendations / similar products per row')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: one per core)')
+    parser.add_argument('--shard-size', type=int, default=10000, help='users or products per task')
+    parser.add_argument('--chunk-size', type=int, default=1024, help='rows scored per sparse product inside a task')
+    args = parser.parse_args(argv)
+
+    snapshot = ensure_snapshot()
+    options = {
+        'num_recommendations': args.num_recommendations,
+        'chunk_size': args.chunk_size,
+        # Fixed once so every shard uses the same seasons
+        'month': datetime.now().month,
+    }
+    if args.job == 'users':
+        shards = user_shards(args.users, args.shard_size)
+    else:
+        shards = product_shards(len(snapshot.array('product_ids')), args.shard_size)
+
+    with open(args.output, 'w') as output:
+        total = run(args.job, shards, output, args.workers, options)
+    print(f"Wrote {total} results to {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import heapq
+import numpy as np
+import pandas as pd
+
+# Time-decayed, interaction-type-weighted popularity per segment.
+#
+# Every event adds weight(interaction_type) * 2 ** (-age / half_life) to its
+# (segment, product) score. Scores are stored with forward decay: an event at
+# time t adds weight * 2 ** ((t - reference) / half_life) once and is never
+# touched again. All scores decay by the same factor as time passes, so the
+# ranking doesn't change with the clock and nothing needs re-aggregating;
+# score(t) rescales to an actual decayed value. Stored scores only grow, which
+# lets each segment keep its top-K in a min-heap: an update is O(log K) and
+# reading the ranking is O(K log K) in K alone.
+
+DEFAULT_TYPE_WEIGHTS = {'view': 1.0, 'click': 2.0, 'add_to_cart': 3.0, 'purchase': 5.0}
+DEFAULT_HALF_LIFE_DAYS = 30
+
+# Rebase stored scores before 2 ** exponent gets anywhere near float overflow
+MAX_EXPONENT = 512
+
+def to_seconds(timestamp):
+    return pd.Timestamp(timestamp).timestamp()
+
+class TopK:
+    """Top-k items by a score that only ever increases, as a lazily cleaned min-heap."""
+    def __init__(self, k):
+        self.k = k
+        self.members = {}  # item -> score, exactly the current top-k
+        self.heap = []     # (score, item), may hold stale entries of members whose score grew
+
+    def update(self, item, score):
+        """Record the item's new score; returns True if the top-k membership changed."""
+        if item in self.members:
+            self.members[item] = score
+            heapq.heappush(self.heap, (score, item))
+            if len(self.heap) > 4 * self.k:
+                self.heap = [(member_score, member) for member, member_score in self.members.items()]
+                heapq.heapify(self.heap)
+            return False
+
+        if len(self.members) < self.k:
+            self.members[item] = score
+            heapq.heappush(self.heap, (score, item))
+            return True
+
+        lowest_score, lowest = self.lowest()
+        if (score, item) <= (lowest_score, lowest):
+            return False
+        heapq.heappop(self.heap)
+        del self.members[lowest]
+        self.members[item] = score
+        heapq.heappush(self.heap, (score, item))
+        return True
+
+    def lowest(self):
+        # Drop entries made stale by later updates of the same member
+        while self.heap[0][0] != self.members.get(self.heap[0][1]):
+            heapq.heappop(self.heap)
+        return self.heap[0]
+
+    def ranked(self):
+        """Members, best first; ties go to the larger item."""
+        return [item for item, _ in sorted(self.members.items(), key=lambda member: (member[1], member[0]), reverse=True)]
+
+    def rescale(self, factor):
+        self.members = {item: score * factor for item, score in self.members.items()}
+        self.heap = [(score * factor, item) for score, item in self.heap]
+
+class PopularityEngine:
+    def __init__(self, type_weights=None, half_life_days=DEFAULT_HALF_LIFE_DAYS, top_k=10, default_weight=1.0):
+        """half_life_days=None disables decay (weighted counts)."""
+        self.type_weights = dict(DEFAULT_TYPE_WEIGHTS if type_weights is None else type_weights)
+        if any(weight < 0 for weight in self.type_weights.values()) or default_weight < 0:
+            raise ValueError("Interaction weights must be non-negative")
+        self.default_weight = default_weight
+        self.half_life = None if half_life_days is None else half_life_days * 86400.0
+        self.top_k = top_k
+
+        self.reference = None  # Time (epoch seconds) at which stored scores are undecayed
+        self.scores = {}       # segment -> {product_id: stored score}
+        self.tops = {}         # segment -> TopK
+        self.versions = {}     # segment -> bumped when its top-k membership changes
+
+    def weight(self, interaction_type):
+        return self.type_weights.get(interaction_type, self.default_weight)
+
+    def growth(self, seconds):
+        """Forward-decay multiplier of an event at time seconds."""
+        if self.half_life is None:
+            return 1.0
+        if self.reference is None:
+            self.reference = seconds
+        exponent = (seconds - self.reference) / self.half_life
+        if exponent > MAX_EXPONENT:
+            self.rebase(seconds)
+            exponent = 0.0
+        return 2.0 ** exponent
+
+    def rebase(self, seconds):
+        # O(all scores), but only once every MAX_EXPONENT half-lives
+        factor = 2.0 ** (-(seconds - self.reference) / self.half_life)
+        for segment, segment_scores in self.scores.items():
+            for product_id in segment_scores:
+                segment_scores[product_id] *= factor
+            self.tops[segment].rescale(factor)
+        self.reference = seconds
+
+    def add(self, segment, product_id, interaction_type, timestamp):
+        """Count one event. timestamp: anything pandas can parse, or epoch seconds."""
+        seconds = timestamp if isinstance(timestamp, (int, float)) else to_seconds(timestamp)
+        self.add_score(segment, product_id, self.weight(interaction_type) * self.growth(seconds))
+
+    def add_score(self, segment, product_id, amount):
+        segment_scores = self.scores.setdefault(segment, {})
+        score = segment_scores.get(product_id, 0.0) + amount
+        segment_scores[product_id] = score
+        top = self.tops.setdefault(segment, TopK(self.top_k))
+        if top.update(product_id, score):
+            self.versions[segment] = self.versions.get(segment, 0) + 1
+
+    def add_interactions(self, interactions):
+        """Bulk-load a DataFrame with segment, product_id, interaction_type and timestamp columns."""
+        interactions = interactions.dropna(subset=['segment'])
+        if interactions.empty:
+            return
+        weights = interactions['interaction_type'].map(self.weight).fillna(self.default_weight).to_numpy(dtype=float)
+        if self.half_life is not None:
+            # Plain dates from the CSV and second-resolution live events (interaction_stream.py) side by side
+            seconds = (pd.to_datetime(interactions['timestamp'], format='ISO8601') - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+            if self.reference is None:
+                self.reference = seconds.max()
+            exponents = (seconds - self.reference) / self.half_life
+            if exponents.max() > MAX_EXPONENT:
+                self.rebase(seconds.max())
+                exponents = (seconds - self.reference) / self.half_life
+            weights = weights * np.exp2(exponents)
+
+        totals = pd.DataFrame({
+            'segment': interactions['segment'].astype(int).to_numpy(),
+            'product_id': interactions['product_id'].to_numpy(),
+            'score': weights,
+        }).groupby(['segment', 'product_id'])['score'].sum()
+        for (segment, product_id), score in totals.items():
+            self.add_score(int(segment), product_id, score)
+
+    def top(self, segment):
+        """(top-k product ids of the segment, best first; version of that list)."""
+        top = self.tops.get(segment)
+        return (top.ranked() if top else []), self.versions.get(segment, 0)
+
+    def score(self, segment, product_id, at=None):
+        """Decayed score of a product at time at (default: the reference time)."""
+        stored = self.scores.get(segment, {}).get(product_id, 0.0)
+        if self.half_life is None or at is None or self.reference is None:
+            return stored
+        seconds = at if isinstance(at, (int, float)) else to_seconds(at)
+        return stored * 2.0 ** (-(seconds - self.reference) / self.half_life)
@@ -0,0 +1,243 @@
+const { spawn } = require("child_process");
+const path = require("path");
+const readline = require("readline");
+
+const WORKER_SCRIPT = path.join(__dirname, "recommendation_worker.py");
+
+// A pool of long-lived python recommendation workers. Each worker loads the
+// product table once and then answers JSON-line requests, so a request only
+// pays for the ranking work instead of interpreter start-up and CSV parsing.
+//
+// At most `size` requests run at once (one per worker); up to `maxQueue` more
+// wait in line. Beyond that recommend() fails fast with an OVERLOADED error,
+// and a request that hasn't been answered within `timeoutMs` (waiting
+// included) fails with TIMEOUT, so callers can shed load instead of queueing
+// without bound. A worker whose task timed out or that wrote unparseable
+// output is killed and replaced. Workers that keep dying are restarted with
+// exponential backoff (up to `maxRestartDelayMs`) until one comes up again.
+class RecommendationPool {
+    constructor({ size = 2, module = "dummy_recommendation", python = "python", maxQueue = 100, timeoutMs = 10000, maxRestartDelayMs = 30000 } = {}) {
+        this.size = size;
+        this.module = module;
+        this.python = python;
+        this.maxQueue = maxQueue;
+        this.timeoutMs = timeoutMs;
+        this.maxRestartDelayMs = maxRestartDelayMs;
+        this.restartFailures = 0;
+        this.restartTimers = new Set();
+        this.workers = [];
+        this.queue = [];
+        this.nextId = 1;
+        this.closed = false;
+
+        for (let i = 0; i < size; i++) {
+            this.workers.push(this.spawnWorker());
+        }
+    }
+
+    spawnWorker() {
+        const child = spawn(this.python, [WORKER_SCRIPT, this.module], {
+            cwd: __dirname,
+            stdio: ["pipe", "pipe", "pipe"],
+        });
+
+        const worker = { child, ready: false, task: null, exited: false };
+
+        readline.createInterface({ input: child.stdout }).on("line", (line) => {
+            this.handleLine(worker, line);
+        });
+
+        child.stderr.on("data", (data) => {
+            console.error(`recommendation worker stderr: ${data}`);
+        });
+
+        // A worker that died before its exit event was handled fails the next write with EPIPE
+        child.stdin.on("error", (error) => {
+            console.error("Recommendation worker stdin error:", error);
+            worker.ready = false;
+            if (worker.task) {
+                // The request never reached python; hand it to another worker
+                this.queue.unshift(worker.task);
+                worker.task = null;
+            }
+            child.kill("SIGKILL");
+            this.handleExit(worker, error.code);
+            this.dispatch();
+        });
+
+        child.on("exit", (code, signal) => {
+            this.handleExit(worker, code === null ? signal : code);
+        });
+
+        // Spawn failures (python missing, ...) are reported here, often without an exit event
+        child.on("error", (error) => {
+            console.error("Recommendation worker error:", error);
+            if (worker.task) {
+                worker.task.reject(error);
+                worker.task = null;
+            }
+            if (!this.workers.some((other) => other !== worker && other.ready)) {
+                // Nothing can answer the queued requests either
+                for (const task of this.queue) {
+                    task.reject(error);
+                }
+                this.queue = [];
+            }
+            this.handleExit(worker, error.code);
+        });
+
+        return worker;
+    }
+
+    handleLine(worker, line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (parseError) {
+            console.error("Error parsing recommendation worker output:", parseError);
+            // The answer to the running task is lost; don't leave it (and the worker) hanging
+            if (worker.task) {
+                this.recycle(worker, new Error("Recommendation worker wrote invalid output"));
+            }
+            return;
+        }
+
+        if (message.ready) {
+            worker.ready = true;
+            this.restartFailures = 0;
+            this.dispatch();
+            return;
+        }
+
+        const task = worker.task;
+        if (!task || task.id !== message.id) {
+            return;
+        }
+        worker.task = null;
+
+        if (message.error) {
+            task.reject(new Error(message.error));
+        } else {
+            task.resolve(message.recommendations);
+        }
+        this.dispatch();
+    }
+
+    recycle(worker, error) {
+        // Kill the worker (SIGKILL, it may be hung) and let handleExit replace it
+        worker.ready = false;
+        if (worker.task) {
+            worker.task.reject(error);
+            worker.task = null;
+        }
+        worker.child.kill("SIGKILL");
+    }
+
+    handleExit(worker, code) {
+        // Both "error" and "exit" can fire for the same child
+        if (worker.exited) {
+            return;
+        }
+        worker.exited = true;
+        worker.ready = false;
+
+        const index = this.workers.indexOf(worker);
+        if (index !== -1) {
+            this.workers.splice(index, 1);
+        }
+
+        if (worker.task) {
+            worker.task.reject(new Error(`Recommendation worker exited with code ${code}`));
+            worker.task = null;
+        }
+
+        // Keep the pool warm: replace crashed workers unless we are shutting down,
+        // backing off while they keep dying before they get ready
+        if (!this.closed) {
+            const delay = this.restartFailures === 0 ? 0 : Math.min(100 * 2 ** (this.restartFailures - 1), this.maxRestartDelayMs);
+            this.restartFailures++;
+            console.error(`Recommendation worker exited with code ${code}, restarting in ${delay} ms`);
+            const timer = setTimeout(() => {
+                this.restartTimers.delete(timer);
+                if (!this.closed) {
+                    this.workers.push(this.spawnWorker());
+                }
+            }, delay);
+            this.restartTimers.add(timer);
+        }
+    }
+
+    dispatch() {
+        for (const worker of this.workers) {
+            if (this.queue.length === 0) {
+                return;
+            }
+            if (!worker.ready || worker.task) {
+                continue;
+            }
+            const task = this.queue.shift();
+            worker.task = task;
+            worker.child.stdin.write(JSON.stringify({ id: task.id, ...task.payload }) + "\n");
+        }
+    }
+
+    recommend(payload) {
+        return new Promise((resolve, reject) => {
+            if (this.queue.length >= this.maxQueue) {
+                reject(poolError("OVERLOADED", "Recommendation queue is full"));
+                return;
+            }
+
+            const task = { id: this.nextId++, payload };
+            const timer = setTimeout(() => {
+                const error = poolError("TIMEOUT", `Recommendation timed out after ${this.timeoutMs} ms`);
+                // Still waiting: drop it from the queue. Already running: the
+                // worker may be hung, so replace it rather than wait for it.
+                const index = this.queue.indexOf(task);
+                if (index !== -1) {
+                    this.queue.splice(index, 1);
+                }
+                const worker = this.workers.find((candidate) => candidate.task === task);
+                if (worker) {
+                    this.recycle(worker, error);
+                } else {
+                    reject(error);
+                }
+            }, this.timeoutMs);
+            task.resolve = (value) => {
+                clearTimeout(timer);
+                resolve(value);
+            };
+            task.reject = (error) => {
+                clearTimeout(timer);
+                reject(error);
+            };
+
+            this.queue.push(task);
+            this.dispatch();
+        });
+    }
+
+    close() {
+        this.closed = true;
+        for (const timer of this.restartTimers) {
+            clearTimeout(timer);
+        }
+        this.restartTimers.clear();
+        for (const worker of this.workers) {
+            worker.child.kill();
+        }
+        for (const task of this.queue) {
+            task.reject(new Error("Recommendation pool closed"));
+        }
+        this.queue = [];
+    }
+}
+
+function poolError(code, message) {
+    const error = new Error(message);
+    error.code = code;
+    return error;
+}
+
+module.exports = RecommendationPool;
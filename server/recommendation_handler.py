@@ -1,10 +1,18 @@
+import os
 import sys
 import json
+import threading
 import pandas as pd
-from sklearn.cluster import KMeans
+import numpy as np
 from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from popularity import PopularityEngine
+from segmentation import UserSegmentation
+from attribute_tagger import add_attributes
+from interaction_stream import merge_segments
+from fusion import Fusion
+from result_cache import ResultCache
+from instrumentation import span, timed
+from model_artifacts import SnapshotWriter, load_current_snapshot, snapshot_matches_catalog, check_can_fit, add_catalog, save_kmeans, save_tfidf, load_tfidf_matrix, load_tfidf_vectorizer
 
 # Load data
 product_data = pd.read_csv('product_data.csv')
@@ -13,45 +21,8 @@ product_data = pd.merge(product_data, product_url_data, on='product_id', how='le
 existing_user_data = pd.read_csv('existing_user_data.csv')
 interaction_data = pd.read_csv('interaction_data.csv')
 
-# Encode categorical variables
-existing_user_data_encoded = pd.get_dummies(existing_user_data, columns=['gender', 'location'])
-
-# Segment users
-demographic_features = existing_user_data_encoded.drop(['user_id', 'name'], axis=1)
-kmeans = KMeans(n_clusters=5, random_state=42)
-existing_user_data_encoded['segment'] = kmeans.fit_predict(demographic_features)
-
-# Process product data
-if 'age_group' not in product_data.columns:
-    product_data['age_group'] = product_data['product_details'].apply(lambda x: 'Kids' if 'kid' in str(x).lower() else 'Adult')
-
-if 'season' not in product_data.columns:
-    def assign_season(details):
-        details_lower = str(details).lower()
-        if 'winter' in details_lower:
-            return 'Winter'
-        elif 'summer' in details_lower:
-            return 'Summer'
-        elif 'monsoon' in details_lower:
-            return 'Monsoon'
-        elif 'autumn' in details_lower:
-            return 'Autumn'
-        elif 'spring' in details_lower:
-            return 'Spring'
-        else:
-            return 'All'
-    product_data['season'] = product_data['product_details'].apply(assign_season)
-
-if 'gender' not in product_data.columns:
-    def assign_gender(detail):
-        detail_lower = str(detail).lower()
-        if 'woman' in detail_lower or 'women' in detail_lower:
-            return 'Female'
-        elif 'man' in detail_lower or 'men' in detail_lower:
-            return 'Male'
-        else:
-            return 'Unisex'
-    product_data['gender'] = product_data['product_details'].apply(assign_gender)
+# Derive age_group, season and gender from product_details where missing (see attribute_tagger.py)
+add_attributes(product_data)
 
 # Create combined features
 product_data['combined_features'] = (
@@ -60,16 +31,155 @@ product_data['combined_features'] = (
     product_data['gender'].fillna('')
 )
 
-# Build TF-IDF matrix
-tfidf = TfidfVectorizer(stop_words='english')
-tfidf_matrix = tfidf.fit_transform(product_data['combined_features'])
+# Prebuilt models (see build_artifacts.py); fall back to fitting when there is no usable snapshot.
+# The segmentation doesn't depend on the catalog, so it comes from any snapshot; the TF-IDF rows
+# only come from catalog_snapshot, the snapshot if it was built for this catalog
+ARTIFACTS_NAME = 'recommender'
+snapshot = load_current_snapshot(ARTIFACTS_NAME)
+catalog_snapshot = snapshot if snapshot_matches_catalog(snapshot, product_data['product_id'], product_data['combined_features']) else None
+
+# Segment users (fixed category -> column encoder + centroids, see segmentation.py)
+if snapshot is not None:
+    segmentation = UserSegmentation.from_snapshot(snapshot)
+else:
+    check_can_fit(ARTIFACTS_NAME)
+    segmentation = UserSegmentation.fit(existing_user_data, n_clusters=5, random_state=42)
+demographic_columns = segmentation.columns
+existing_user_data['segment'] = segmentation.segment_users(existing_user_data)
+segmentation.set_cluster_sizes(existing_user_data['segment'])
 
 # Merge interaction data with user segments
-interaction_data = interaction_data.merge(existing_user_data_encoded[['user_id', 'segment']], on='user_id', how='left')
-
-# Popular Products per Segment
-popular_products = interaction_data.groupby(['segment', 'product_id']).size().reset_index(name='counts')
-top_products_per_segment = popular_products.sort_values(['segment', 'counts'], ascending=False).groupby('segment').head(10)
+interaction_data = merge_segments(interaction_data, existing_user_data)
+
+# Popular Products per Segment: interaction-type weighted and time-decayed,
+# maintained incrementally from here on (see popularity.py)
+popularity = PopularityEngine()
+popularity.add_interactions(interaction_data)
+
+# Content models are built on first use, so the initial (login_count == 0)
+# path never imports sklearn or touches TF-IDF. model(name) / handler.<name>
+# builds a model's group the first time; servers call warm_up() before taking
+# traffic, and RECOMMENDER_LAZY=0 builds everything at import. With a
+# snapshot no path imports sklearn; the fitted vectorizer (model('tfidf')) is
+# only built for save_artifacts.
+
+def load_content_vectors():
+    global tfidf_index, tfidf_matrix
+    if catalog_snapshot is not None:
+        tfidf_index, tfidf_matrix = None, load_tfidf_matrix(catalog_snapshot)
+    else:
+        # New or changed products are added to the incremental index instead of refitting (see tfidf_index.py)
+        from tfidf_index import load_catalog_tfidf
+        check_can_fit(ARTIFACTS_NAME)
+        tfidf_index, tfidf_matrix = load_catalog_tfidf(product_data['product_id'], product_data['combined_features'], stop_words='english')
+
+def load_vectorizer():
+    # Nothing on the request path transforms text; only save_artifacts needs the fitted vectorizer (and sklearn)
+    global tfidf
+    if catalog_snapshot is not None:
+        tfidf = load_tfidf_vectorizer(catalog_snapshot, stop_words='english')
+    else:
+        tfidf = model('tfidf_index').vectorizer()
+
+def load_content_index():
+    global content_index, item_similarity
+    from candidate_index import build_candidate_index
+    from item_similarity import ItemSimilarity, ARTIFACTS_NAME as SIMILARITY_ARTIFACTS_NAME
+
+    content_index = build_candidate_index(model('tfidf_matrix'))
+
+    # Precomputed item-item neighbours (python build_artifacts.py similarity), if
+    # there is a table for this catalog; content candidates then come from merging
+    # the neighbour lists of the user's products instead of a profile search
+    similarity_snapshot = load_current_snapshot(SIMILARITY_ARTIFACTS_NAME)
+    item_similarity = ItemSimilarity.from_snapshot(similarity_snapshot) if snapshot_matches_catalog(similarity_snapshot, product_data['product_id'], product_data['combined_features']) else None
+
+def load_interaction_stream():
+    global interaction_matrix, interaction_stream
+    from user_profiles import InteractionMatrix
+    from interaction_stream import InteractionStream
+
+    # Sparse user x product matrix for O(1) per-user interaction lookups
+    interaction_matrix = InteractionMatrix(interaction_data, product_data['product_id'])
+
+    # Live interaction events (interaction_stream.ingest) update segment popularity
+    # and user profiles in place; compaction appends them to interaction_data.csv
+    interaction_stream = InteractionStream(
+        interaction_matrix,
+        model('tfidf_matrix'),
+        dict(zip(existing_user_data['user_id'], existing_user_data['segment'])),
+        popularity,
+        path='interaction_data.csv'
+    )
+
+LAZY_MODELS = {
+    'tfidf': load_vectorizer,
+    'tfidf_matrix': load_content_vectors,
+    'tfidf_index': load_content_vectors,
+    'content_index': load_content_index,
+    'item_similarity': load_content_index,
+    'interaction_matrix': load_interaction_stream,
+    'interaction_stream': load_interaction_stream,
+}
+models_lock = threading.RLock()
+
+def model(name):
+    """The named lazily built model, building its group on first use."""
+    if name not in globals():
+        with models_lock:
+            if name not in globals():
+                LAZY_MODELS[name]()
+    return globals()[name]
+
+def __getattr__(name):
+    # handler.tfidf_matrix etc. from other modules (PEP 562)
+    if name in LAZY_MODELS:
+        return model(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def warm_up():
+    """Build every lazy model now instead of on the first request; the vectorizer only when asked for."""
+    for name in LAZY_MODELS:
+        if name != 'tfidf':
+            model(name)
+
+def top_products(segment):
+    """(product ids popular in the segment, best first; version of that list), without building the interaction stream."""
+    if 'interaction_stream' in globals():
+        # Live events update popularity under the stream's lock
+        return interaction_stream.top_products(segment)
+    product_ids, version = popularity.top(int(segment))
+    return np.array(product_ids), version
+
+def save_artifacts():
+    """Write the fitted models as a new snapshot and make it CURRENT. Returns the snapshot path."""
+    writer = SnapshotWriter(ARTIFACTS_NAME)
+    add_catalog(writer, product_data['product_id'], product_data['combined_features'])
+    save_kmeans(writer, segmentation, demographic_columns)
+    save_tfidf(writer, model('tfidf'), model('tfidf_matrix'))
+    return writer.publish()
+
+# Hybrid score fusion: demographic weight 1, content (interaction) weight 2
+fusion = Fusion({'demographic': 1, 'content': 2})
+
+# The content list of the fusion is, in full, every eligible product the user
+# hasn't interacted with, ranked by similarity. With weighted_sum a product's
+# content weight doesn't depend on its rank, so instead of ranking all of them
+# only the best N + len(demographic) are ranked (enough to fill the top-N past
+# the demographic products) and the demographic products that are missing
+# from those get their content weight appended directly.
+
+def num_content_candidates(num_recommendations, demographic_indices, num_allowed):
+    if fusion.strategy != 'weighted_sum':
+        # Rank-dependent strategies need every product's content rank
+        return num_allowed
+    return min(num_allowed, num_recommendations + len(demographic_indices))
+
+def with_demographic_content(content_indices, demographic_indices, interacted_indices):
+    """content_indices followed by the (eligible) demographic products it misses that the user hasn't interacted with."""
+    content_indices = np.asarray(content_indices, dtype=np.int64)
+    missing = ~np.isin(demographic_indices, interacted_indices) & ~np.isin(demographic_indices, content_indices)
+    return np.concatenate([content_indices, np.asarray(demographic_indices, dtype=np.int64)[missing]])
 
 def get_season(location, month):
     season_map = {
@@ -79,99 +189,130 @@ def get_season(location, month):
     }
     return season_map.get(location, {}).get(month, 'All')
 
-def recommend_initial(user_info, user_segment, top_products_per_segment, num_recommendations=5):
+SEASONS = ['Winter', 'Spring', 'Summer', 'Monsoon', 'Autumn', 'All']
+AGE_GROUPS = ['Kids', 'Adult']
+
+def eligibility_mask(products, season, age_group, gender):
+    return (
+        ((products['season'] == season) | (products['season'] == 'All')) &
+        ((products['age_group'] == age_group) | (products['age_group'] == 'All')) &
+        ((products['gender'] == gender) | (products['gender'] == 'Unisex'))
+    ).to_numpy()
+
+def build_eligibility_index(products):
+    """Precompute eligible row positions for every (season, age_group, gender) combination in the catalog."""
+    index = {}
+    for season in SEASONS:
+        for age_group in AGE_GROUPS:
+            for gender in products['gender'].dropna().unique():
+                index[(season, age_group, gender)] = np.flatnonzero(eligibility_mask(products, season, age_group, gender))
+    return index
+
+eligibility_index = build_eligibility_index(product_data)
+catalog_genders = set(product_data['gender'].dropna().unique())
+
+def refresh_eligibility_index():
+    # Must be called whenever product_data is reloaded
+    global eligibility_index, catalog_genders
+    eligibility_index = build_eligibility_index(product_data)
+    catalog_genders = set(product_data['gender'].dropna().unique())
+    result_cache.invalidate()
+
+def eligible_product_indices(season, age_group, gender):
+    # Values outside the catalog (e.g. a lowercase gender from user input) only match the
+    # All / Unisex products, so they all share one key and the index stays bounded
+    key = (
+        season if season in SEASONS else None,
+        age_group if age_group in AGE_GROUPS else None,
+        gender if gender in catalog_genders else None,
+    )
+    if key not in eligibility_index:
+        eligibility_index[key] = np.flatnonzero(eligibility_mask(product_data, *key))
+    return eligibility_index[key]
+
+def popular_first(eligible_indices, segment_product_ids, num_recommendations):
+    """Eligible row positions with the segment's popular products first."""
+    popular = np.isin(product_data['product_id'].to_numpy()[eligible_indices], segment_product_ids)
+
+    recommended_indices = eligible_indices[popular]
+    if len(recommended_indices) < num_recommendations:
+        recommended_indices = np.concatenate([recommended_indices, eligible_indices[~popular]])
+    return recommended_indices[:num_recommendations]
+
+def user_features(user_info):
+    """(season, age_group, gender): everything about the user that eligibility depends on."""
     current_month = datetime.now().month
-    user_location = user_info['location']
-    user_age = user_info['age']
-    user_gender = user_info['gender']
-    user_age_group = 'Kids' if user_age <= 12 else 'Adult'
-    user_season = get_season(user_location, current_month)
-
-    eligible_products = product_data[
-        (
-            ((product_data['season'] == user_season) | (product_data['season'] == 'All')) &
-            ((product_data['age_group'] == user_age_group) | (product_data['age_group'] == 'All')) &
-            ((product_data['gender'] == user_gender) | (product_data['gender'] == 'Unisex'))
-        )
-    ]
-
-    segment_products = top_products_per_segment[top_products_per_segment['segment'] == user_segment]
-    segment_product_ids = segment_products['product_id']
-
-    recommended_products = eligible_products[eligible_products['product_id'].isin(segment_product_ids)]
-
-    if len(recommended_products) < num_recommendations:
-        additional_products = eligible_products[~eligible_products['product_id'].isin(recommended_products['product_id'])]
-        recommended_products = pd.concat([recommended_products, additional_products])
-
-    recommendations = recommended_products.head(num_recommendations).to_dict(orient='records')
-    
+    user_age_group = 'Kids' if user_info['age'] <= 12 else 'Adult'
+    user_season = get_season(user_info['location'], current_month)
+    return user_season, user_age_group, user_info['gender']
+
+def product_records(indices):
+    recommendations = product_data.iloc[indices].to_dict(orient='records')
+
     for rec in recommendations:
         rec['product_image_url'] = rec.get('product_image_url', 'https://via.placeholder.com/300x300?text=No+Image')
         rec['product_url'] = rec.get('product_url', '#')
-    
+
     return recommendations
 
+# Initial recommendations only depend on the segment and user_features, so
+# users in the same demographic bucket share one cached result. Keys carry the
+# model version and the version of the segment's popular products;
+# refresh_eligibility_index drops everything on reload.
+MODEL_VERSION = snapshot.version if snapshot is not None else 'fitted'
+result_cache = ResultCache()
+
+def initial_candidates(features, segment_product_ids, num_recommendations=5):
+    return popular_first(eligible_product_indices(*features), segment_product_ids, num_recommendations)
+
+def recommend_initial(user_info, user_segment, num_recommendations=5):
+    features = user_features(user_info)
+    segment_product_ids, popularity_version = top_products(user_segment)
+    key = (MODEL_VERSION, int(user_segment), popularity_version, *features, num_recommendations)
+    recommendations = result_cache.get_or_compute(
+        key,
+        lambda: product_records(initial_candidates(features, segment_product_ids, num_recommendations))
+    )
+    return [dict(rec) for rec in recommendations]
+
+@timed('recommend_updated')
 def recommend_updated(user_info, user_segment, num_recommendations=5):
-    current_month = datetime.now().month
-    user_location = user_info['location']
-    user_age = user_info['age']
-    user_gender = user_info['gender']
-    user_age_group = 'Kids' if user_age <= 12 else 'Adult'
-    user_season = get_season(user_location, current_month)
-
-    user_interaction_data = interaction_data[interaction_data['user_id'] == user_info['user_id']]
-
-    eligible_products = product_data[
-        (
-            ((product_data['season'] == user_season) | (product_data['season'] == 'All')) &
-            ((product_data['age_group'] == user_age_group) | (product_data['age_group'] == 'All')) &
-            ((product_data['gender'] == user_gender) | (product_data['gender'] == 'Unisex'))
-        )
-    ]
-
-    if not user_interaction_data.empty:
-        interacted_products = user_interaction_data['product_id'].unique()
-        product_indices = product_data[product_data['product_id'].isin(interacted_products)].index
-
-        eligible_indices = eligible_products.index
-        eligible_tfidf_matrix = tfidf_matrix[eligible_indices]
-
-        user_tfidf_matrix = tfidf_matrix[product_indices]
-        user_profile_vector = user_tfidf_matrix.mean(axis=0)
-
-        similarities = cosine_similarity(user_profile_vector, eligible_tfidf_matrix).flatten()
-
-        similarity_df = pd.DataFrame({
-            'product_id': eligible_products['product_id'],
-            'similarity': similarities
-        })
-
-        similarity_df = similarity_df[~similarity_df['product_id'].isin(interacted_products)]
-        similarity_df = similarity_df.sort_values('similarity', ascending=False)
-
-        content_recs = similarity_df['product_id'].tolist()
-
-        demographic_recs = recommend_initial(user_info, user_segment, top_products_per_segment, num_recommendations*2)
-
-        recs = pd.DataFrame({'product_id': demographic_recs + content_recs})
-        recs['score'] = 0
-        recs.loc[recs['product_id'].isin(demographic_recs), 'score'] += 1
-        recs.loc[recs['product_id'].isin(content_recs), 'score'] += 2
-
-        final_recommendations = recs.drop_duplicates().sort_values('score', ascending=False)['product_id'].tolist()
-        final_recommendations = final_recommendations[:num_recommendations]
+    # Includes events ingested since start-up
+    with span('recommend_updated.user_view'):
+        interacted_indices, user_profile_vector = model('interaction_stream').user_view(user_info['user_id'])
+        segment_product_ids, _ = top_products(user_segment)
+
+    with span('recommend_updated.eligibility'):
+        eligible_indices = eligible_product_indices(*user_features(user_info))
+
+    if len(interacted_indices) > 0:
+        with span('recommend_updated.demographic'):
+            demographic_indices = popular_first(eligible_indices, segment_product_ids, num_recommendations*2)
+
+        with span('recommend_updated.content'):
+            allowed = np.zeros(len(product_data), dtype=bool)
+            allowed[eligible_indices] = True
+            allowed[interacted_indices] = False
+
+            num_content = num_content_candidates(num_recommendations, demographic_indices, int(allowed.sum()))
+            content_indices = []
+            if model('item_similarity') is not None:
+                content_indices, _ = item_similarity.candidates(interacted_indices, num_content, allowed=allowed)
+            if len(content_indices) < num_content:
+                # No table, or the neighbour lists don't reach enough eligible products
+                content_indices, _ = model('content_index').search(user_profile_vector, num_content, allowed=allowed)
+            content_indices = with_demographic_content(content_indices, demographic_indices, interacted_indices)
+
+        with span('recommend_updated.fusion'):
+            final_indices = fusion.fuse({'demographic': demographic_indices, 'content': content_indices}, num_recommendations)
     else:
-        final_recommendations = recommend_initial(user_info, user_segment, top_products_per_segment, num_recommendations)
+        with span('recommend_updated.demographic'):
+            final_indices = popular_first(eligible_indices, segment_product_ids, num_recommendations)
 
-    recommended_products = product_data[product_data['product_id'].isin(final_recommendations)].to_dict(orient='records')
-    
-    for rec in recommended_products:
-        rec['product_image_url'] = rec.get('product_image_url', 'https://via.placeholder.com/300x300?text=No+Image')
-        rec['product_url'] = rec.get('product_url', '#')
-    
-    return recommended_products
+    with span('recommend_updated.records'):
+        return product_records(final_indices)
 
+@timed('get_recommendations')
 def get_recommendations(email, name, age, gender, city, login_count):
     user_info = {
         'user_id': email,
@@ -181,26 +322,20 @@ def get_recommendations(email, name, age, gender, city, login_count):
         'location': city
     }
 
-    new_user_data = pd.DataFrame([user_info])
-    new_user_data_encoded = pd.get_dummies(new_user_data, columns=['gender', 'location'])
-
-    for col in demographic_features.columns:
-        if col not in new_user_data_encoded.columns:
-            new_user_data_encoded[col] = 0
-
-    extra_cols = [col for col in new_user_data_encoded.columns if col not in demographic_features.columns and col not in ['user_id', 'name']]
-    new_user_data_encoded.drop(columns=extra_cols, inplace=True)
-
-    new_user_features = new_user_data_encoded[demographic_features.columns]
-    user_segment = kmeans.predict(new_user_features)[0]
+    with span('get_recommendations.segment'):
+        user_segment = segmentation.segment(user_info)
 
     if int(login_count) == 0:
-        recommendations = recommend_initial(user_info, user_segment, top_products_per_segment)
+        with span('get_recommendations.initial'):
+            recommendations = recommend_initial(user_info, user_segment)
     else:
         recommendations = recommend_updated(user_info, user_segment)
 
     return recommendations
 
+if os.environ.get('RECOMMENDER_LAZY', '1') == '0':
+    warm_up()
+
 if __name__ == '__main__':
     email, name, age, gender, city, login_count = sys.argv[1:]
     recommendations = get_recommendations(email, name, age, gender, city, login_count)
@@ -0,0 +1,62 @@
+import sys
+import json
+import importlib
+
+# Long-lived recommendation worker.
+#
+# Loads a recommender module (dummy_recommendation or initial_recommendation)
+# once, then answers requests as JSON lines on stdin/stdout so that the
+# interpreter start-up, the pandas/numpy imports and the product CSV load are
+# paid once per worker instead of once per request.
+#
+# Request:  {"id": 1, "email": ..., "name": ..., "age": ..., "gender": ..., "city": ..., "page": 0}
+# Response: {"id": 1, "recommendations": [...]}  or  {"id": 1, "error": "..."}
+#
+# {"id": 2, "stats": true} answers {"id": 2, "stats": {...}} with the
+# recommender's result cache hit/miss counters.
+
+DEFAULT_MODULE = 'dummy_recommendation'
+
+def send(message):
+    sys.stdout.write(json.dumps(message) + '\n')
+    sys.stdout.flush()
+
+def handle_request(recommender, request):
+    user_info, page = recommender.parse_request(
+        request.get('email'),
+        request.get('name'),
+        request.get('age'),
+        request.get('gender', ''),
+        request.get('city'),
+        request.get('page', 0)
+    )
+    return recommender.recommend_initial(user_info, page)
+
+def serve(module_name=DEFAULT_MODULE):
+    recommender = importlib.import_module(module_name)
+    # Modules that defer model loading build everything before the first request
+    if hasattr(recommender, 'warm_up'):
+        recommender.warm_up()
+
+    # Tell the parent process the product table is loaded and we can take work
+    send({'ready': True, 'module': module_name})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('stats'):
+                send({'id': request_id, 'stats': recommender.result_cache.stats()})
+                continue
+            recommendations = handle_request(recommender, request)
+            send({'id': request_id, 'recommendations': recommendations})
+        except Exception as e:
+            send({'id': request_id, 'error': str(e)})
+
+if __name__ == '__main__':
+    serve(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODULE)
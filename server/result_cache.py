@@ -0,0 +1,78 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# In-process LRU/TTL cache for recommendation results.
+#
+# Initial recommendations only depend on a handful of derived user features
+# (gender and page, or segment / season / age group / gender), so most users
+# share a few results. Callers build keys from those features plus the catalog
+# or model version, and call invalidate() when the catalog or the artifacts
+# are reloaded.
+#
+#   RECOMMENDER_CACHE_SIZE  max entries per cache (default 4096, 0 disables caching)
+#   RECOMMENDER_CACHE_TTL   seconds an entry stays valid (default: until evicted)
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get('RECOMMENDER_CACHE_SIZE', 4096))
+DEFAULT_TTL = float(os.environ.get('RECOMMENDER_CACHE_TTL', 0)) or None
+
+class ResultCache:
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, calling compute() on a miss. Values are shared, so don't mutate them."""
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or now < expires_at:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Computed outside the lock: two concurrent misses on one key both
+        # compute, which is cheaper than serializing every miss
+        value = compute()
+        if self.max_entries <= 0:
+            return value
+
+        with self.lock:
+            self.entries[key] = (None if self.ttl is None else now + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
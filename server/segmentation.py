@@ -0,0 +1,194 @@
+import sys
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+
+from model_artifacts import CentroidSegmenter, load_current_snapshot, load_kmeans
+
+# Demographic user segmentation.
+#
+# DemographicEncoder turns users into the KMeans feature matrix with fixed
+# category -> column maps (the same columns pd.get_dummies produced when the
+# model was fitted), writing straight into a NumPy array. UserSegmentation
+# wraps the fitted centroids; partial_fit() refines them online with
+# mini-batch k-means steps (each centroid stays the running mean of every user
+# assigned to it), so new users can be folded in and large user bases can be
+# fitted and segmented in streaming chunks.
+#
+#   python segmentation.py users.csv -o segments.csv              # segment with the current snapshot
+#   python segmentation.py users.csv -o segments.csv --fit        # fit centroids over the file first
+
+CATEGORICAL_FIELDS = ('gender', 'location')
+ID_FIELDS = ('user_id', 'name')
+
+class DemographicEncoder:
+    def __init__(self, columns):
+        """columns: feature columns in model order, named like pd.get_dummies output ('age', 'gender_Female', ...)."""
+        self.columns = list(columns)
+        self.numeric = {}     # field -> column position
+        self.categories = {}  # field -> {category: column position}
+        for position, column in enumerate(self.columns):
+            field, separator, category = column.partition('_')
+            if separator and field in CATEGORICAL_FIELDS:
+                self.categories.setdefault(field, {})[category] = position
+            else:
+                self.numeric[column] = position
+
+    @classmethod
+    def fit(cls, users):
+        """Columns for a users DataFrame, in the order pd.get_dummies(users, columns=CATEGORICAL_FIELDS) gives them."""
+        columns = [column for column in users.columns if column not in ID_FIELDS and column not in CATEGORICAL_FIELDS]
+        for field in CATEGORICAL_FIELDS:
+            columns += [f'{field}_{category}' for category in sorted(users[field].dropna().unique())]
+        return cls(columns)
+
+    def encode(self, users):
+        """Feature matrix for users: a DataFrame or a dict of equal-length columns.
+        Categories the model wasn't fitted with encode as all zeros."""
+        num_users = len(users[next(iter(self.numeric or self.categories))])
+        features = np.zeros((num_users, len(self.columns)))
+        for field, position in self.numeric.items():
+            features[:, position] = np.asarray(users[field], dtype=float)
+        for field, mapping in self.categories.items():
+            positions = np.fromiter((mapping.get(value, -1) for value in users[field]), dtype=np.int64, count=num_users)
+            known = np.flatnonzero(positions >= 0)
+            features[known, positions[known]] = 1.0
+        return features
+
+    def encode_one(self, user_info):
+        return self.encode({field: [value] for field, value in user_info.items()})
+
+class UserSegmentation:
+    def __init__(self, encoder, model, cluster_sizes=None, refresh_size=256):
+        """model: anything with predict() and cluster_centers_ (KMeans, CentroidSegmenter, ...).
+        cluster_sizes: users behind each centroid, how strongly partial_fit holds on to it."""
+        self.encoder = encoder
+        self.model = model
+        n_clusters = len(model.cluster_centers_)
+        self.cluster_sizes = np.ones(n_clusters) if cluster_sizes is None else np.asarray(cluster_sizes, dtype=float)
+        self.refresh_size = refresh_size
+        self.observed = []
+        self.seen_users = set()  # user_ids already part of the centroids or of observed
+        self.lock = threading.Lock()
+
+    @classmethod
+    def fit(cls, users, n_clusters=5, random_state=42):
+        from sklearn.cluster import KMeans
+
+        encoder = DemographicEncoder.fit(users)
+        model = KMeans(n_clusters=n_clusters, random_state=random_state).fit(encoder.encode(users))
+        return cls(encoder, model, np.bincount(model.labels_, minlength=n_clusters))
+
+    @classmethod
+    def fit_stream(cls, chunks, encoder, n_clusters=5, random_state=42):
+        """Fit over an iterable of user DataFrames (e.g. pd.read_csv(..., chunksize=...)):
+        KMeans on the first chunk, mini-batch updates for the rest."""
+        from sklearn.cluster import KMeans
+
+        segmentation = None
+        for chunk in chunks:
+            features = encoder.encode(chunk)
+            if segmentation is None:
+                model = KMeans(n_clusters=n_clusters, random_state=random_state).fit(features)
+                segmentation = cls(encoder, CentroidSegmenter(model.cluster_centers_), np.bincount(model.labels_, minlength=n_clusters))
+            else:
+                segmentation.partial_fit(features)
+        return segmentation
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        model, columns = load_kmeans(snapshot)
+        return cls(DemographicEncoder(columns), model)
+
+    @property
+    def cluster_centers_(self):
+        return self.model.cluster_centers_
+
+    @property
+    def columns(self):
+        return self.encoder.columns
+
+    def predict(self, features):
+        return self.model.predict(features)
+
+    def segment(self, user_info):
+        return int(self.model.predict(self.encoder.encode_one(user_info))[0])
+
+    def segment_users(self, users, chunk_size=100000):
+        """Segments for every row of a users DataFrame, encoded and predicted chunk by chunk."""
+        return np.concatenate([
+            self.model.predict(self.encoder.encode(users.iloc[start:start + chunk_size]))
+            for start in range(0, len(users), chunk_size)
+        ] or [np.array([], dtype=np.int32)])
+
+    def partial_fit(self, features):
+        """Move the centroids towards a batch of encoded users."""
+        with self.lock:
+            centers = np.array(self.model.cluster_centers_, dtype=float)
+            labels = CentroidSegmenter(centers).predict(features)
+            for cluster in np.unique(labels):
+                members = features[labels == cluster]
+                self.cluster_sizes[cluster] += len(members)
+                centers[cluster] += (members.sum(axis=0) - len(members) * centers[cluster]) / self.cluster_sizes[cluster]
+            # Swap in a new model so concurrent predict() calls never see half-updated centroids
+            self.model = CentroidSegmenter(centers)
+
+    def set_cluster_sizes(self, segments):
+        """Weigh the centroids by how many users they were assigned (e.g. after loading them from a snapshot)."""
+        self.cluster_sizes = np.bincount(segments, minlength=len(self.model.cluster_centers_)).astype(float)
+
+    def add_known_users(self, user_ids):
+        """Users the centroids were fitted on (or that were segmented with them); observe() skips them."""
+        with self.lock:
+            self.seen_users.update(user_ids)
+
+    def observe(self, user_info):
+        """Fold a user not seen before into the centroids, once; refit once refresh_size users have been observed.
+        Repeat visits don't count, so the centroids stay close to the assignments made at start-up."""
+        with self.lock:
+            if user_info['user_id'] in self.seen_users:
+                return
+            self.seen_users.add(user_info['user_id'])
+            self.observed.append(self.encoder.encode_one(user_info))
+            if len(self.observed) < self.refresh_size:
+                return
+            features = np.vstack(self.observed)
+            self.observed = []
+        self.partial_fit(features)
+
+def encoder_for_csv(path, chunk_size):
+    """DemographicEncoder.fit for a CSV too large to load at once: one pass over the categorical columns."""
+    numeric = [column for column in pd.read_csv(path, nrows=0).columns if column not in ID_FIELDS and column not in CATEGORICAL_FIELDS]
+    categories = {field: set() for field in CATEGORICAL_FIELDS}
+    for chunk in pd.read_csv(path, usecols=list(CATEGORICAL_FIELDS), chunksize=chunk_size):
+        for field in CATEGORICAL_FIELDS:
+            categories[field].update(chunk[field].dropna().unique())
+    return DemographicEncoder(numeric + [f'{field}_{category}' for field in CATEGORICAL_FIELDS for category in sorted(categories[field])])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Segment a (large) users CSV in streaming chunks.')
+    parser.add_argument('users', help='CSV with user_id, age, gender, location columns')
+    parser.add_argument('-o', '--output', required=True, help='CSV of user_id, segment')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--fit', action='store_true', help='fit the centroids over the file first (one extra pass)')
+    parser.add_argument('--clusters', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    snapshot = load_current_snapshot('recommender')
+    if args.fit:
+        encoder = encoder_for_csv(args.users, args.chunk_size)
+        segmentation = UserSegmentation.fit_stream(pd.read_csv(args.users, chunksize=args.chunk_size), encoder, args.clusters)
+    elif snapshot is not None:
+        segmentation = UserSegmentation.from_snapshot(snapshot)
+    else:
+        sys.exit("No recommender snapshot to segment with; run build_artifacts.py or pass --fit")
+
+    with open(args.output, 'w') as output:
+        output.write('user_id,segment\n')
+        for chunk in pd.read_csv(args.users, chunksize=args.chunk_size):
+            segments = segmentation.predict(segmentation.encoder.encode(chunk))
+            pd.DataFrame({'user_id': chunk['user_id'], 'segment': segments}).to_csv(output, header=False, index=False)
+
+if __name__ == '__main__':
+    main()
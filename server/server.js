@@ -1,12 +1,24 @@
 const express = require("express");
-const fs = require("fs");
 const path = require("path");
 const cors = require("cors");
 const jwt = require("jsonwebtoken");
-const { exec } = require('child_process');
+const os = require("os");
+const RecommendationPool = require("./recommendationPool");
+const UserStore = require("./userStore");
 const app = express();
 const PORT = 5001;
 
+// Warm pool of python workers that keep the recommender loaded between requests
+// const recommendationPool = new RecommendationPool({ module: "initial_recommendation" });
+const recommendationPool = new RecommendationPool({
+    module: "dummy_recommendation",
+    size: Number(process.env.RECOMMENDATION_WORKERS) || Math.min(os.cpus().length, 4),
+    python: process.env.PYTHON || "python",
+    // Requests beyond the workers wait here; past that (or past the timeout) they get 503/504
+    maxQueue: Number(process.env.RECOMMENDATION_QUEUE) || 100,
+    timeoutMs: Number(process.env.RECOMMENDATION_TIMEOUT_MS) || 10000,
+});
+
 const JWT_SECRET = "SUP3RS3CRET";
 
 app.use(cors());
@@ -14,39 +26,32 @@ app.use(express.json());
 
 const USERS_FILE = path.join(__dirname, "users.json");
 
-const readUsersFromFile = () => {
-    if (!fs.existsSync(USERS_FILE)) {
-        fs.writeFileSync(USERS_FILE, JSON.stringify([]));
-    }
-    const data = fs.readFileSync(USERS_FILE, "utf-8");
-    return JSON.parse(data);
-};
+// users.json is loaded once; signups are written through to it
+const userStore = new UserStore(USERS_FILE);
 
-const writeUsersToFile = (users) => {
-    fs.writeFileSync(USERS_FILE, JSON.stringify(users, null, 2));
-};
+const findUserByEmail = (email) => userStore.findByEmail(email);
 
-const findUserByEmail = (email) => {
-    const users = readUsersFromFile();
-    return users.find(user => user.email === email);
-};
-
-app.post("/signup", (req, res) => {
+app.post("/signup", async (req, res) => {
     const { name, email, password, gender, age, city } = req.body;
 
     if (!name || !email || !password || !gender || !age || !city) {
         return res.status(400).json({ message: "All fields are required" });
     }
 
-    const users = readUsersFromFile();
-
-    if (users.find((user) => user.email === email)) {
+    if (findUserByEmail(email)) {
         return res.status(400).json({ message: "User already exists" });
     }
 
     const newUser = { name, email, password, gender, age, city };
-    users.push(newUser);
-    writeUsersToFile(users);
+    try {
+        await userStore.add(newUser);
+    } catch (error) {
+        if (findUserByEmail(email)) {
+            return res.status(400).json({ message: "User already exists" });
+        }
+        console.error(`Error saving user: ${error.message}`);
+        return res.status(500).json({ message: "Could not register user" });
+    }
 
     res.status(201).json({ message: "User registered successfully" });
 });
@@ -94,30 +99,34 @@ app.post("/api/initial-recommendation", (req, res) => {
         return res.status(404).json({ error: 'User not found' });
     }
 
-    // const command = `python initial_recommendation.py "${user.email}" "${user.name}" ${user.age} ${user.gender} "${user.city}" ${page}`;
-    const command = `python dummy_recommendation.py "${user.email}" "${user.name}" ${user.age} ${user.gender} "${user.city}" ${page}`;
-
-    
-    exec(command, (error, stdout, stderr) => {
-        if (error) {
+    recommendationPool
+        .recommend({
+            email: user.email,
+            name: user.name,
+            age: user.age,
+            gender: user.gender,
+            city: user.city,
+            page,
+        })
+        .then((recommendations) => res.json(recommendations))
+        .catch((error) => {
+            if (error.code === "OVERLOADED") {
+                res.set("Retry-After", "1");
+                return res.status(503).json({ error: 'Recommendation service is busy, try again shortly' });
+            }
+            if (error.code === "TIMEOUT") {
+                return res.status(504).json({ error: 'Recommendation request timed out' });
+            }
             console.error(`Error: ${error.message}`);
-            return res.status(500).json({ error: 'An error occurred while generating recommendations' });
-        }
-        if (stderr) {
-            console.error(`stderr: ${stderr}`);
-            // Log stderr but don't necessarily treat it as an error
-        }
-        
-        try {
-            const recommendations = JSON.parse(stdout);
-            res.json(recommendations);
-        } catch (parseError) {
-            console.error('Error parsing recommendation output:', parseError);
-            res.status(500).json({ error: 'Error processing recommendations' });
-        }
-    });
+            res.status(500).json({ error: 'An error occurred while generating recommendations' });
+        });
 });
 
 app.listen(PORT, () => {
     console.log(`Server running on port ${PORT}`);
+});
+
+process.on("SIGINT", () => {
+    recommendationPool.close();
+    process.exit(0);
 });
\ No newline at end of file
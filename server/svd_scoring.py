@@ -0,0 +1,83 @@
+import numpy as np
+
+from candidate_index import top_k
+
+# Vectorized scoring with a trained surprise SVD.
+#
+# algo.predict(uid, iid) computes one estimate per call in Python. SVDScorer
+# pulls the factor matrices and biases out of the model once and scores the
+# whole catalog with a single matrix-vector product (or matrix-matrix for a
+# batch of users), reproducing algo.predict's estimates including its
+# unknown-user / unknown-item fallbacks and rating-scale clipping.
+
+class SVDScorer:
+    def __init__(self, algo, product_ids):
+        trainset = algo.trainset
+        self.algo = algo
+        self.product_ids = np.asarray(product_ids)
+        self.global_mean = trainset.global_mean
+        self.rating_min, self.rating_max = trainset.rating_scale
+        self.biased = algo.biased
+
+        self.pu = np.asarray(algo.pu)
+        self.bu = np.asarray(algo.bu)
+
+        # Catalog position -> inner item id (-1 for products the model never saw)
+        item_rows = np.array([
+            _inner(trainset.to_inner_iid, product_id) for product_id in self.product_ids.tolist()
+        ], dtype=float)
+        item_rows = np.nan_to_num(item_rows, nan=-1).astype(np.int64)
+        self.known_items = item_rows >= 0
+
+        # Factors/biases of unknown items are zero, so one dense product covers the whole catalog
+        self.qi = np.zeros((len(item_rows), algo.qi.shape[1]))
+        self.qi[self.known_items] = np.asarray(algo.qi)[item_rows[self.known_items]]
+        self.bi = np.zeros(len(item_rows))
+        self.bi[self.known_items] = np.asarray(algo.bi)[item_rows[self.known_items]]
+
+    def inner_user(self, user_id):
+        return _inner(self.algo.trainset.to_inner_uid, user_id)
+
+    def score(self, user_id):
+        """Estimated rating of every catalog product for one user, same as algo.predict(user_id, pid).est."""
+        return self.score_users([user_id])[0]
+
+    def score_users(self, user_ids):
+        """(users x products) matrix of estimated ratings."""
+        inner_users = [self.inner_user(user_id) for user_id in user_ids]
+        known_users = np.array([inner is not None for inner in inner_users])
+        user_rows = np.array([inner if inner is not None else 0 for inner in inner_users], dtype=np.int64)
+
+        # The dot product only applies when both the user and the item are known
+        interactions = (self.pu[user_rows] @ self.qi.T) * known_users[:, None]
+
+        if self.biased:
+            scores = self.global_mean + interactions
+            scores += self.bi[None, :] * self.known_items
+            scores += (self.bu[user_rows] * known_users)[:, None]
+        else:
+            # Unbiased SVD is a bare dot product and can't predict for unknown
+            # users/items, where surprise falls back to the global mean
+            scores = np.where(known_users[:, None] & self.known_items[None, :], interactions, self.global_mean)
+
+        return np.clip(scores, self.rating_min, self.rating_max)
+
+    def recommend(self, user_id, num_recommendations, exclude=None):
+        """Top-N product ids by estimated rating; exclude is an optional boolean mask over the catalog."""
+        return self.recommend_users([user_id], num_recommendations, None if exclude is None else exclude[None, :])[0]
+
+    def recommend_users(self, user_ids, num_recommendations, exclude=None):
+        """Top-N product ids for many users; exclude is an optional (users x products) boolean mask."""
+        scores = self.score_users(user_ids)
+        recommendations = []
+        for row, user_scores in enumerate(scores):
+            candidates = np.arange(len(self.product_ids)) if exclude is None else np.flatnonzero(~exclude[row])
+            best, _ = top_k(candidates, user_scores[candidates], num_recommendations)
+            recommendations.append(self.product_ids[best].tolist())
+        return recommendations
+
+def _inner(to_inner, raw_id):
+    try:
+        return to_inner(raw_id)
+    except ValueError:
+        return None  # Not part of the trainset
@@ -0,0 +1,242 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+from model_artifacts import SnapshotWriter, load_current_snapshot
+
+# Incremental TF-IDF over the product catalog.
+#
+# Refitting TfidfVectorizer re-tokenizes the whole catalog whenever a single
+# product is added. TfidfIndex fits once and then keeps its vocabulary
+# frozen: new or changed products (by a hash of their text) are tokenized
+# against it and appended as new rows, so onboarding SKUs costs O(new
+# items). Rows belong to product ids, not to DataFrame positions;
+# matrix(product_ids) gathers the rows in whatever order the caller's
+# product table has, so positional code downstream keeps working.
+#
+# Raw term counts are kept next to the TF-IDF rows. Once the rows added or
+# replaced since the last refresh reach REFRESH_FRACTION of the catalog, the
+# idf is recomputed from the counts (no re-tokenizing) and replaced rows are
+# dropped. Terms outside the frozen vocabulary are ignored until the next
+# full fit (python build_artifacts.py tfidf).
+#
+#   index, changed = TfidfIndex.load_or_fit(product_data['product_id'], product_data['combined_features'], stop_words='english')
+#   tfidf_matrix = index.matrix(product_data['product_id'])
+
+ARTIFACTS_NAME = 'tfidf-index'
+REFRESH_FRACTION = 0.1
+
+def text_hashes(texts):
+    return pd.util.hash_pandas_object(pd.Series(texts).fillna('').astype(str), index=False).to_numpy()
+
+def smooth_idf(document_frequency, num_documents):
+    # TfidfVectorizer's default (smooth_idf=True)
+    return np.log((1 + num_documents) / (1 + document_frequency)) + 1
+
+class TfidfIndex:
+    def __init__(self, vocabulary, idf, counts, tfidf_matrix, row_product_ids, row_hashes, live, vectorizer_params, rows_since_refresh=0):
+        self.vocabulary = vocabulary            # term -> column, frozen at fit
+        self.idf = idf
+        self.counts = counts                    # raw term counts, one row per (product, text version)
+        self.tfidf_matrix = tfidf_matrix        # L2-normalized counts * idf, same rows
+        self.row_product_ids = row_product_ids
+        self.row_hashes = row_hashes
+        self.live = live                        # False for rows replaced by a newer version or dropped from the catalog
+        self.vectorizer_params = vectorizer_params
+        self.rows_since_refresh = rows_since_refresh
+        self._rows = None
+
+    @classmethod
+    def fit(cls, product_ids, texts, **vectorizer_params):
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+
+        counter = CountVectorizer(dtype=np.float64, **vectorizer_params)
+        counts = counter.fit_transform(pd.Series(texts).fillna('').astype(str))
+        transformer = TfidfTransformer()
+        tfidf_matrix = transformer.fit_transform(counts)
+        return cls(
+            {term: int(column) for term, column in counter.vocabulary_.items()},
+            transformer.idf_,
+            counts.tocsr(),
+            tfidf_matrix.tocsr(),
+            np.asarray(product_ids),
+            text_hashes(texts),
+            np.ones(counts.shape[0], dtype=bool),
+            vectorizer_params,
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        state = snapshot.json('tfidf_index')
+        return cls(
+            snapshot.json('tfidf_vocabulary'),
+            np.asarray(snapshot.array('tfidf_idf')),
+            snapshot.sparse('tfidf_counts'),
+            snapshot.sparse('tfidf_matrix'),
+            snapshot.array('row_product_ids'),
+            snapshot.array('row_hashes'),
+            snapshot.array('row_live'),
+            state['vectorizer_params'],
+            state['rows_since_refresh'],
+        )
+
+    @classmethod
+    def load_or_fit(cls, product_ids, texts, **vectorizer_params):
+        """(index, changed): the CURRENT index brought up to date with the catalog, or a fresh fit
+        if there is none (or it was built with other vectorizer parameters). changed says whether
+        it differs from what is published."""
+        snapshot = load_current_snapshot(ARTIFACTS_NAME)
+        if snapshot is not None:
+            index = cls.from_snapshot(snapshot)
+            if index.vectorizer_params == vectorizer_params:
+                return index, index.update(product_ids, texts)
+            print(f"TF-IDF index {snapshot.version} has different vectorizer parameters, refitting", file=sys.stderr)
+        return cls.fit(product_ids, texts, **vectorizer_params), True
+
+    def vectorizer(self):
+        """A fitted TfidfVectorizer over the frozen vocabulary, for transforming queries."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        tfidf = TfidfVectorizer(vocabulary=self.vocabulary, **self.vectorizer_params)
+        tfidf.idf_ = self.idf
+        return tfidf
+
+    def rows(self):
+        """product_id -> row of its live version."""
+        if self._rows is None:
+            self._rows = pd.Index(np.asarray(self.row_product_ids)[np.asarray(self.live)])
+        return self._rows
+
+    def matrix(self, product_ids):
+        """TF-IDF rows for product_ids, in that order. Every id must be in the index (see update)."""
+        product_ids = np.asarray(product_ids)
+        live = np.asarray(self.live)
+        # The common case, nothing changed since the catalog was indexed: the (memory-mapped) matrix as is
+        if live.all() and np.array_equal(self.row_product_ids, product_ids):
+            return self.tfidf_matrix
+        positions = self.rows().get_indexer(product_ids)
+        if (positions < 0).any():
+            raise KeyError(f"{(positions < 0).sum()} products are not in the TF-IDF index; update() it first")
+        return self.tfidf_matrix[np.flatnonzero(live)[positions]]
+
+    def transform_counts(self, texts):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        return CountVectorizer(vocabulary=self.vocabulary, dtype=np.float64, **self.vectorizer_params).transform(pd.Series(texts).fillna('').astype(str)).tocsr()
+
+    def weigh(self, counts):
+        from sklearn.preprocessing import normalize
+
+        return normalize(counts.multiply(self.idf[None, :]).tocsr())
+
+    def update(self, product_ids, texts):
+        """Append rows for new and changed products and retire the rows of products no longer in the
+        catalog. Only the new texts are tokenized. Returns whether anything changed."""
+        import scipy.sparse as sp
+
+        product_ids = np.asarray(product_ids)
+        hashes = text_hashes(texts)
+        positions = self.rows().get_indexer(product_ids)
+        live_rows = np.flatnonzero(np.asarray(self.live))
+        current_hashes = np.asarray(self.row_hashes)[live_rows]
+
+        known = positions >= 0
+        unchanged = np.zeros(len(product_ids), dtype=bool)
+        unchanged[known] = current_hashes[positions[known]] == hashes[known]
+        added = np.flatnonzero(~unchanged)
+
+        live = np.zeros(len(self.row_product_ids), dtype=bool)
+        live[live_rows[positions[unchanged]]] = True
+        if len(added) == 0 and np.array_equal(live, self.live):
+            return False
+
+        if len(added):
+            counts = self.transform_counts(pd.Series(texts).iloc[added])
+            self.counts = sp.vstack([self.counts, counts], format='csr')
+            self.tfidf_matrix = sp.vstack([self.tfidf_matrix, self.weigh(counts)], format='csr')
+            self.row_product_ids = np.concatenate([self.row_product_ids, product_ids[added]])
+            self.row_hashes = np.concatenate([self.row_hashes, hashes[added]])
+            live = np.concatenate([live, np.ones(len(added), dtype=bool)])
+        self.live = live
+        self.rows_since_refresh += len(added)
+        self._rows = None
+
+        if self.rows_since_refresh >= REFRESH_FRACTION * live.sum():
+            self.refresh()
+        return True
+
+    def refresh(self):
+        """Drop retired rows and recompute the idf (and so every TF-IDF row) from the stored counts."""
+        live = np.flatnonzero(np.asarray(self.live))
+        self.counts = self.counts[live]
+        self.row_product_ids = np.asarray(self.row_product_ids)[live]
+        self.row_hashes = np.asarray(self.row_hashes)[live]
+        self.live = np.ones(len(live), dtype=bool)
+
+        document_frequency = np.bincount(self.counts.indices, minlength=len(self.vocabulary))
+        self.idf = smooth_idf(document_frequency, self.counts.shape[0])
+        self.tfidf_matrix = self.weigh(self.counts)
+        self.rows_since_refresh = 0
+        self._rows = None
+
+    def save(self, writer):
+        writer.add_json('tfidf_vocabulary', self.vocabulary)
+        writer.add_array('tfidf_idf', self.idf)
+        writer.add_sparse('tfidf_counts', self.counts)
+        writer.add_sparse('tfidf_matrix', self.tfidf_matrix)
+        writer.add_array('row_product_ids', self.row_product_ids)
+        writer.add_array('row_hashes', self.row_hashes)
+        writer.add_array('row_live', self.live)
+        writer.add_json('tfidf_index', {'vectorizer_params': self.vectorizer_params, 'rows_since_refresh': self.rows_since_refresh})
+
+    def publish(self):
+        writer = SnapshotWriter(ARTIFACTS_NAME)
+        self.save(writer)
+        return writer.publish()
+
+def load_catalog_tfidf(product_ids, texts, **vectorizer_params):
+    """(TfidfIndex, TF-IDF rows in product_ids order) from the incremental index, publishing the updated
+    index so the next start doesn't redo the update. index.vectorizer() builds a fitted TfidfVectorizer."""
+    if not pd.Index(product_ids).is_unique:
+        # Rows can't be keyed by product id; a plain positional fit, like TfidfVectorizer.fit_transform
+        print('Duplicate product ids, fitting TF-IDF without the incremental index', file=sys.stderr)
+        index = TfidfIndex.fit(product_ids, texts, **vectorizer_params)
+        return index, index.tfidf_matrix
+    index, changed = TfidfIndex.load_or_fit(product_ids, texts, **vectorizer_params)
+    # Refits (build_artifacts.py, benchmarks) start from scratch and publish through save_artifacts
+    if changed and not os.environ.get('RECOMMENDER_REFIT'):
+        index.publish()
+    return index, index.matrix(product_ids)
+
+def save_artifacts():
+    """Fit the index on recommendation_handler's catalog from scratch and publish it. Returns the snapshot path."""
+    import recommendation_handler as handler
+
+    index = TfidfIndex.fit(handler.product_data['product_id'], handler.product_data['combined_features'], stop_words='english')
+    return index.publish()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bring the TF-IDF index up to date with product_data.csv.')
+    parser.add_argument('--refit', action='store_true', help='fit from scratch (new vocabulary) instead of updating')
+    parser.add_argument('--refresh', action='store_true', help='recompute the idf now')
+    args = parser.parse_args(argv)
+
+    if args.refit:
+        print(f"Published TF-IDF index snapshot: {save_artifacts()}")
+        return
+
+    import recommendation_handler as handler
+
+    index, changed = TfidfIndex.load_or_fit(handler.product_data['product_id'], handler.product_data['combined_features'], stop_words='english')
+    if args.refresh:
+        index.refresh()
+        changed = True
+    if changed:
+        print(f"Published TF-IDF index snapshot: {index.publish()}")
+    else:
+        print('TF-IDF index is up to date')
+
+if __name__ == '__main__':
+    main()
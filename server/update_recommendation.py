@@ -2,57 +2,28 @@
 
 from flask import Flask, request, jsonify, render_template
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
 from datetime import datetime
+from user_profiles import InteractionMatrix
+from interaction_stream import InteractionStream, parse_event, merge_segments
+from popularity import PopularityEngine
+from segmentation import UserSegmentation
+from attribute_tagger import add_attributes
+from fusion import Fusion
+from instrumentation import span, timed, register_endpoints
+from model_artifacts import load_current_snapshot, snapshot_matches_catalog, load_tfidf_matrix
+from tfidf_index import load_catalog_tfidf
 
 # 1. Load Data
 
 # Existing User Data (for clustering)
 existing_user_data = pd.read_csv('existing_user_data.csv')
 
-# Encode categorical variables
-existing_user_data_encoded = pd.get_dummies(existing_user_data, columns=['gender', 'location'])
-
-# Segment users
-demographic_features = existing_user_data_encoded.drop(['user_id', 'name'], axis=1)
-kmeans = KMeans(n_clusters=5, random_state=42)
-existing_user_data_encoded['segment'] = kmeans.fit_predict(demographic_features)
-
 # Product Data
 product_data = pd.read_csv('product_data.csv')
 
-# Process 'product_details' to assign 'age_group', 'season', and 'gender' if not already present
-if 'age_group' not in product_data.columns:
-    product_data['age_group'] = product_data['product_details'].apply(lambda x: 'Kids' if 'kid' in str(x).lower() else 'Adult')
-
-if 'season' not in product_data.columns:
-    def assign_season(details):
-        details_lower = str(details).lower()
-        if 'winter' in details_lower:
-            return 'Winter'
-        elif 'summer' in details_lower:
-            return 'Summer'
-        elif 'monsoon' in details_lower:
-            return 'Monsoon'
-        elif 'autumn' in details_lower:
-            return 'Autumn'
-        elif 'spring' in details_lower:
-            return 'Spring'
-        else:
-            return 'All'
-    product_data['season'] = product_data['product_details'].apply(assign_season)
-
-if 'gender' not in product_data.columns:
-    def assign_gender(detail):
-        detail_lower = str(detail).lower()
-        if 'woman' in detail_lower or 'women' in detail_lower:
-            return 'Female'
-        elif 'man' in detail_lower or 'men' in detail_lower:
-            return 'Male'
-        else:
-            return 'Unisex'
-    product_data['gender'] = product_data['product_details'].apply(assign_gender)
+# Process 'product_details' to assign 'age_group', 'season', and 'gender' if not already present (one vectorized scan, see attribute_tagger.py)
+add_attributes(product_data)
 
 # Create combined features (include 'gender')
 product_data['combined_features'] = (
@@ -61,19 +32,57 @@ product_data['combined_features'] = (
     product_data['gender'].fillna('')
 )
 
+# Prebuilt models shared with recommendation_handler.py (see build_artifacts.py);
+# fall back to fitting when there is no usable snapshot. The segmentation comes
+# from any snapshot, the TF-IDF rows only from one built for this catalog
+snapshot = load_current_snapshot('recommender')
+catalog_snapshot = snapshot if snapshot_matches_catalog(snapshot, product_data['product_id'], product_data['combined_features']) else None
+
+# Segment users (fixed category -> column encoder + centroids, see segmentation.py)
+if snapshot is not None:
+    segmentation = UserSegmentation.from_snapshot(snapshot)
+else:
+    segmentation = UserSegmentation.fit(existing_user_data, n_clusters=5, random_state=42)
+demographic_columns = segmentation.columns
+existing_user_data['segment'] = segmentation.segment_users(existing_user_data)
+segmentation.set_cluster_sizes(existing_user_data['segment'])
+# Existing users are already behind the centroids; only new users get folded in (observe)
+segmentation.add_known_users(existing_user_data['user_id'].tolist())
+
 # Build TF-IDF matrix
-tfidf = TfidfVectorizer(stop_words='english')
-tfidf_matrix = tfidf.fit_transform(product_data['combined_features'])
+if catalog_snapshot is not None:
+    tfidf_matrix = load_tfidf_matrix(catalog_snapshot)
+else:
+    # New or changed products are added to the incremental index instead of refitting (see tfidf_index.py)
+    _, tfidf_matrix = load_catalog_tfidf(product_data['product_id'], product_data['combined_features'], stop_words='english')
 
 # Interaction Data
 interaction_data = pd.read_csv('interaction_data.csv')
 
 # Merge interaction data with user segments
-interaction_data = interaction_data.merge(existing_user_data_encoded[['user_id', 'segment']], on='user_id', how='left')
+interaction_data = merge_segments(interaction_data, existing_user_data)
+
+# Sparse user x product matrix for O(1) per-user interaction lookups
+interaction_matrix = InteractionMatrix(interaction_data, product_data['product_id'])
+
+# Popular Products per Segment: interaction-type weighted and time-decayed,
+# maintained incrementally from here on (see popularity.py)
+popularity = PopularityEngine()
+popularity.add_interactions(interaction_data)
+
+# Live interaction events (POST /events) update segment popularity and user
+# profiles in place; compaction appends them to interaction_data.csv
+interaction_stream = InteractionStream(
+    interaction_matrix,
+    tfidf_matrix,
+    dict(zip(existing_user_data['user_id'], existing_user_data['segment'])),
+    popularity,
+    path='interaction_data.csv'
+)
+COMPACTION_INTERVAL = 60  # seconds
 
-# Popular Products per Segment
-popular_products = interaction_data.groupby(['segment', 'product_id']).size().reset_index(name='counts')
-top_products_per_segment = popular_products.sort_values(['segment', 'counts'], ascending=False).groupby('segment').head(10)
+# Hybrid score fusion
+fusion = Fusion({'demographic': 1, 'content': 2})
 
 # Season mapping based on location and month
 def get_season(location, month):
@@ -104,6 +113,7 @@ def get_season(location, month):
 
 # 2. Define Functions
 
+@timed('recommend_updated')
 def recommend_updated(user_info, user_segment, num_recommendations=5):
     # Get current month
     current_month = datetime.now().month
@@ -113,72 +123,66 @@ def recommend_updated(user_info, user_segment, num_recommendations=5):
     user_age_group = 'Kids' if user_age <= 12 else 'Adult'
     user_season = get_season(user_location, current_month)
 
-    # Get user's interaction data
-    user_interaction_data = interaction_data[interaction_data['user_id'] == user_info['user_id']]
+    # Get user's interacted products (catalog row positions) and profile, including live events
+    with span('recommend_updated.user_view'):
+        interacted_indices, user_profile_vector = interaction_stream.user_view(user_info['user_id'])
 
     # Filter products based on season, age_group, and gender
-    eligible_products = product_data[
-        (
-            ((product_data['season'] == user_season) | (product_data['season'] == 'All')) &
-            ((product_data['age_group'] == user_age_group) | (product_data['age_group'] == 'All')) &
-            ((product_data['gender'] == user_gender) | (product_data['gender'] == 'Unisex'))
-        )
-    ]
+    with span('recommend_updated.eligibility'):
+        eligible_products = product_data[
+            (
+                ((product_data['season'] == user_season) | (product_data['season'] == 'All')) &
+                ((product_data['age_group'] == user_age_group) | (product_data['age_group'] == 'All')) &
+                ((product_data['gender'] == user_gender) | (product_data['gender'] == 'Unisex'))
+            )
+        ]
 
     # If user has interactions, use content-based filtering
-    if not user_interaction_data.empty:
-        # Build user profile
-        interacted_products = user_interaction_data['product_id'].unique()
-        product_indices = product_data[product_data['product_id'].isin(interacted_products)].index
+    if len(interacted_indices) > 0:
+        with span('recommend_updated.content'):
+            # Recalculate the TF-IDF matrix for eligible products
+            eligible_indices = eligible_products.index
+            eligible_tfidf_matrix = tfidf_matrix[eligible_indices]
 
-        # Recalculate the TF-IDF matrix for eligible products
-        eligible_indices = eligible_products.index
-        eligible_tfidf_matrix = tfidf_matrix[eligible_indices]
+            # Calculate similarities between user profile and eligible products
+            from sklearn.metrics.pairwise import cosine_similarity
+            similarities = cosine_similarity(user_profile_vector, eligible_tfidf_matrix).flatten()
 
-        # Build the user profile vector using only the eligible products
-        user_tfidf_matrix = tfidf_matrix[product_indices]
-        user_profile_vector = user_tfidf_matrix.mean(axis=0)
+            # Create a DataFrame with product IDs and similarity scores
+            similarity_df = pd.DataFrame({
+                'product_id': eligible_products['product_id'],
+                'similarity': similarities
+            })
 
-        # Calculate similarities between user profile and eligible products
-        from sklearn.metrics.pairwise import cosine_similarity
-        similarities = cosine_similarity(user_profile_vector, eligible_tfidf_matrix).flatten()
+            # Exclude already interacted products
+            similarity_df = similarity_df[~np.isin(eligible_indices, interacted_indices)]
 
-        # Create a DataFrame with product IDs and similarity scores
-        similarity_df = pd.DataFrame({
-            'product_id': eligible_products['product_id'],
-            'similarity': similarities
-        })
+            # Sort by similarity
+            similarity_df = similarity_df.sort_values('similarity', ascending=False)
 
-        # Exclude already interacted products
-        similarity_df = similarity_df[~similarity_df['product_id'].isin(interacted_products)]
-
-        # Sort by similarity
-        similarity_df = similarity_df.sort_values('similarity', ascending=False)
-
-        # Get content-based recommendations
-        content_recs = similarity_df['product_id'].tolist()
+            # Get content-based recommendations
+            content_recs = similarity_df['product_id'].tolist()
 
         # Get demographic recommendations
-        demographic_recs = recommend_initial(user_info, user_segment, top_products_per_segment, num_recommendations*2)
-
-        # Combine and rank recommendations
-        recs = pd.DataFrame({'product_id': demographic_recs + content_recs})
-        recs['score'] = 0
-        recs.loc[recs['product_id'].isin(demographic_recs), 'score'] += 1  # Demographic weight
-        recs.loc[recs['product_id'].isin(content_recs), 'score'] += 2      # Interaction weight
-
-        # Remove duplicates and sort
-        final_recommendations = recs.drop_duplicates().sort_values('score', ascending=False)['product_id'].tolist()
-
-        # Limit to desired number of recommendations
-        final_recommendations = final_recommendations[:num_recommendations]
+        with span('recommend_updated.demographic'):
+            demographic_recs = recommend_initial(user_info, user_segment, num_recommendations*2)
+
+        # Combine and rank recommendations (demographic weight 1, interaction weight 2)
+        with span('recommend_updated.fusion'):
+            ranked_lists = {
+                'demographic': interaction_matrix.product_positions(demographic_recs),
+                'content': interaction_matrix.product_positions(content_recs),
+            }
+            final_indices = fusion.fuse(ranked_lists, num_recommendations)
+            final_recommendations = product_data['product_id'].to_numpy()[final_indices].tolist()
     else:
         # If no interactions, fall back to initial recommendations
-        final_recommendations = recommend_initial(user_info, user_segment, top_products_per_segment, num_recommendations)
+        with span('recommend_updated.demographic'):
+            final_recommendations = recommend_initial(user_info, user_segment, num_recommendations)
 
     return final_recommendations
 
-def recommend_initial(user_info, user_segment, top_products_per_segment, num_recommendations=5):
+def recommend_initial(user_info, user_segment, num_recommendations=5):
     # Get current month
     current_month = datetime.now().month
     user_location = user_info['location']
@@ -197,8 +201,7 @@ def recommend_initial(user_info, user_segment, top_products_per_segment, num_rec
     ]
 
     # Get popular products in the user's segment
-    segment_products = top_products_per_segment[top_products_per_segment['segment'] == user_segment]
-    segment_product_ids = segment_products['product_id']
+    segment_product_ids, _ = interaction_stream.top_products(user_segment)
 
     # Filter eligible products that are popular in the user's segment
     recommended_products = eligible_products[eligible_products['product_id'].isin(segment_product_ids)]
@@ -215,6 +218,7 @@ def recommend_initial(user_info, user_segment, top_products_per_segment, num_rec
 # 3. Initialize Flask App
 
 app = Flask(__name__)
+register_endpoints(app)
 
 @app.route('/')
 def home():
@@ -231,38 +235,40 @@ def updated_recommend():
         'location': request.form['location']
     }
 
-    # Create DataFrame for the user
-    user_data = pd.DataFrame({
-        'user_id': [user_info['user_id']],
-        'name': [user_info['name']],
-        'age': [user_info['age']],
-        'gender': [user_info['gender']],
-        'location': [user_info['location']]
-    })
-    user_data_encoded = pd.get_dummies(user_data, columns=['gender', 'location'])
-
-    # Ensure all columns match existing users
-    for col in demographic_features.columns:
-        if col not in user_data_encoded.columns:
-            user_data_encoded[col] = 0
-
-    # Remove any extra columns not in demographic_features
-    extra_cols = [col for col in user_data_encoded.columns if col not in demographic_features.columns and col not in ['user_id', 'name']]
-    user_data_encoded.drop(columns=extra_cols, inplace=True)
-
-    # Ensure the order of columns matches
-    user_features = user_data_encoded[demographic_features.columns]
-
-    # Predict the user's segment
-    user_segment = kmeans.predict(user_features)[0]
+    # Predict the user's segment, and fold the user into the centroids if they are new
+    with span('updated_recommend.segment'):
+        user_segment = segmentation.segment(user_info)
+        segmentation.observe(user_info)
 
     # Generate recommendations
     recommendations = recommend_updated(user_info, user_segment)
 
     # Fetch product details for display
-    recommended_products = product_data[product_data['product_id'].isin(recommendations)]
-
-    return render_template('recommendations1.html', products=recommended_products.to_dict(orient='records'))
+    with span('updated_recommend.render'):
+        recommended_products = product_data[product_data['product_id'].isin(recommendations)]
+        return render_template('recommendations1.html', products=recommended_products.to_dict(orient='records'))
+
+@app.route('/events', methods=['POST'])
+def ingest_events():
+    # One event or a list of {user_id, product_id, interaction_type, timestamp (optional)}
+    events = request.get_json(silent=True)
+    if isinstance(events, dict):
+        events = [events]
+    if not isinstance(events, list) or not all(
+        isinstance(event, dict) and {'user_id', 'product_id', 'interaction_type'} <= event.keys() for event in events
+    ):
+        return jsonify({'error': 'expected an event or a list of events with user_id, product_id and interaction_type'}), 400
+
+    # Validate the whole batch first so a bad event doesn't leave it half ingested
+    try:
+        events = [parse_event(event['user_id'], event['product_id'], event['interaction_type'], event.get('timestamp')) for event in events]
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+
+    for event in events:
+        interaction_stream.ingest(*event)
+    return jsonify({'ingested': len(events)})
 
 if __name__ == '__main__':
+    interaction_stream.start_compaction(COMPACTION_INTERVAL)
     app.run(debug=True)
@@ -0,0 +1,53 @@
+const fs = require("fs");
+const path = require("path");
+
+// In-memory index of users.json, keyed by email. The file is read once at
+// start-up; lookups never touch the disk. Writes go through to the file
+// asynchronously and one at a time (write to a temp file, then rename), so
+// the event loop is never blocked and the file is never half-written.
+class UserStore {
+    constructor(file) {
+        this.file = file;
+        this.users = new Map();
+        this.pendingWrite = Promise.resolve();
+
+        if (!fs.existsSync(file)) {
+            fs.writeFileSync(file, JSON.stringify([]));
+        }
+        for (const user of JSON.parse(fs.readFileSync(file, "utf-8"))) {
+            this.users.set(user.email, user);
+        }
+    }
+
+    findByEmail(email) {
+        return this.users.get(email);
+    }
+
+    // Resolves once the user is on disk. Rejects (and forgets the user) if the write fails.
+    async add(user) {
+        if (this.users.has(user.email)) {
+            throw new Error("User already exists");
+        }
+        // Indexed right away so concurrent signups with the same email are rejected
+        this.users.set(user.email, user);
+        try {
+            await this.persist();
+        } catch (error) {
+            this.users.delete(user.email);
+            throw error;
+        }
+    }
+
+    persist() {
+        // Chained so writes land in order; each one writes the latest state
+        const write = this.pendingWrite.catch(() => {}).then(async () => {
+            const tmp = `${this.file}.${process.pid}.tmp`;
+            await fs.promises.writeFile(tmp, JSON.stringify([...this.users.values()], null, 2));
+            await fs.promises.rename(tmp, this.file);
+        });
+        this.pendingWrite = write;
+        return write;
+    }
+}
+
+module.exports = UserStore;
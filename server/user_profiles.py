@@ -0,0 +1,100 @@
+import numpy as np
+import scipy.sparse as sp
+
+# Sparse user x product interaction matrix.
+#
+# Built once when interaction data is loaded so that looking up a user's
+# interacted products, or their TF-IDF profile, is a CSR row slice instead of
+# a scan over the whole interaction DataFrame.
+
+class InteractionMatrix:
+    def __init__(self, interactions, product_ids):
+        """interactions: DataFrame with user_id and product_id columns.
+        product_ids: catalog product ids, in the same order as the tfidf_matrix rows."""
+        self.product_ids = np.asarray(product_ids)
+        self.product_rows = {product_id: row for row, product_id in enumerate(self.product_ids.tolist())}
+
+        user_ids = interactions['user_id'].tolist()
+        self.user_rows = {}
+        for user_id in user_ids:
+            self.user_rows.setdefault(user_id, len(self.user_rows))
+
+        rows = np.fromiter((self.user_rows[user_id] for user_id in user_ids), dtype=np.int64, count=len(user_ids))
+        cols = np.fromiter((self.product_rows.get(product_id, -1) for product_id in interactions['product_id'].tolist()), dtype=np.int64, count=len(user_ids))
+        # Interactions with products missing from the catalog cannot be scored
+        known = cols >= 0
+
+        self.matrix = sp.csr_matrix(
+            (np.ones(known.sum()), (rows[known], cols[known])),
+            shape=(len(self.user_rows), len(self.product_ids))
+        )
+        self.matrix.sum_duplicates()
+        self.matrix.data[:] = 1  # Repeated interactions with a product count once
+
+    def merged(self, user_ids, product_ids):
+        """New InteractionMatrix with the (user_id, product_id) pairs added; this one is left untouched."""
+        merged = InteractionMatrix.__new__(InteractionMatrix)
+        merged.product_ids = self.product_ids
+        merged.product_rows = self.product_rows
+        merged.user_rows = dict(self.user_rows)
+        for user_id in user_ids:
+            merged.user_rows.setdefault(user_id, len(merged.user_rows))
+
+        rows = np.array([merged.user_rows[user_id] for user_id in user_ids], dtype=np.int64)
+        cols = np.array([self.product_rows.get(product_id, -1) for product_id in product_ids], dtype=np.int64)
+        known = cols >= 0
+
+        shape = (len(merged.user_rows), len(self.product_ids))
+        base = self.matrix.copy()
+        base.resize(shape)
+        merged.matrix = sp.csr_matrix(base + sp.csr_matrix((np.ones(known.sum()), (rows[known], cols[known])), shape=shape))
+        merged.matrix.sum_duplicates()
+        merged.matrix.data[:] = 1
+        return merged
+
+    def interacted_products(self, user_id):
+        """Catalog row positions of the products the user interacted with."""
+        row = self.user_rows.get(user_id)
+        if row is None:
+            return np.array([], dtype=np.int32)
+        return self.matrix.indices[self.matrix.indptr[row]:self.matrix.indptr[row + 1]]
+
+    def interacted_product_ids(self, user_id):
+        return self.product_ids[self.interacted_products(user_id)]
+
+    def product_positions(self, product_ids):
+        """Catalog row positions of product ids, skipping ids that are not in the catalog."""
+        rows = [self.product_rows.get(product_id, -1) for product_id in product_ids]
+        return np.array([row for row in rows if row >= 0], dtype=np.int64)
+
+    def interacted_mask(self, user_id):
+        mask = np.zeros(len(self.product_ids), dtype=bool)
+        mask[self.interacted_products(user_id)] = True
+        return mask
+
+    def rows(self, user_ids):
+        """Interaction rows for many users; users without interactions get an empty row."""
+        positions = np.array([self.user_rows.get(user_id, -1) for user_id in user_ids], dtype=np.int64)
+        known = positions >= 0
+        selector = sp.csr_matrix(
+            (np.ones(known.sum()), (np.flatnonzero(known), positions[known])),
+            shape=(len(user_ids), self.matrix.shape[0])
+        )
+        return sp.csr_matrix(selector @ self.matrix)
+
+    def profile(self, user_id, tfidf_matrix):
+        """Mean TF-IDF vector (1 x features ndarray) of the user's interacted products."""
+        return np.asarray(tfidf_matrix[self.interacted_products(user_id)].mean(axis=0))
+
+    def profiles(self, user_ids, tfidf_matrix):
+        """L2-normalized mean TF-IDF profiles for many users as one sparse matrix, ready for cosine scoring."""
+        return build_profiles(self.rows(user_ids), tfidf_matrix)
+
+def build_profiles(interactions, tfidf_matrix):
+    counts = np.asarray(interactions.sum(axis=1)).ravel()
+    inverse_counts = np.divide(1.0, counts, out=np.zeros_like(counts, dtype=float), where=counts > 0)
+    profiles = sp.diags(inverse_counts) @ interactions @ tfidf_matrix
+
+    norms = np.sqrt(np.asarray(profiles.multiply(profiles).sum(axis=1)).ravel())
+    inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return sp.csr_matrix(sp.diags(inverse_norms) @ profiles)